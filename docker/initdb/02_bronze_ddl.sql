@@ -1,5 +1,7 @@
 -- helper to create standardized bronze columns
 -- NOTE: business data is TEXT to prevent load failures
+-- NOTE: metadata columns default to the transaction-local settings bronze.snapshot_id, bronze.run_id
+--       and bronze.source_file, so the loader can COPY the CSV columns straight into the table
 
 CREATE TABLE IF NOT EXISTS bronze.orders (
     order_id TEXT, 
@@ -10,10 +12,10 @@ CREATE TABLE IF NOT EXISTS bronze.orders (
     order_delivered_carrier_date TEXT,
     order_delivered_customer_date TEXT,
     order_estimated_delivery_date TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_orders_snapshot ON bronze.orders(_snapshot_id);
 
@@ -25,10 +27,10 @@ CREATE TABLE IF NOT EXISTS bronze.order_items (
     shipping_limit_date TEXT,
     price TEXT,
     freight_value TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_order_items_snapshot ON bronze.order_items(_snapshot_id);
 
@@ -38,10 +40,10 @@ CREATE TABLE IF NOT EXISTS bronze.customers (
     customer_zip_code_prefix TEXT,
     customer_city TEXT,
     customer_state TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_customers_snapshot ON bronze.customers(_snapshot_id);
 
@@ -55,10 +57,10 @@ CREATE TABLE IF NOT EXISTS bronze.products (
     product_length_cm TEXT,
     product_height_cm TEXT,
     product_width_cm TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_products_snapshot ON bronze.products(_snapshot_id);
 
@@ -67,10 +69,10 @@ CREATE TABLE IF NOT EXISTS bronze.sellers (
     seller_zip_code_prefix TEXT,
     seller_city TEXT,
     seller_state TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_sellers_snapshot ON bronze.sellers(_snapshot_id);
 
@@ -82,10 +84,10 @@ CREATE TABLE IF NOT EXISTS bronze.order_reviews (
     review_comment_message TEXT,
     review_creation_date TEXT,
     review_answer_timestamp TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_order_reviews_snapshot ON bronze.order_reviews(_snapshot_id);
 
@@ -95,10 +97,10 @@ CREATE TABLE IF NOT EXISTS bronze.order_payments (
     payment_type TEXT,
     payment_installments TEXT,
     payment_value TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_order_payments_snapshot ON bronze.order_payments(_snapshot_id);
 
@@ -108,20 +110,20 @@ CREATE TABLE IF NOT EXISTS bronze.geolocation (
     geolocation_lng TEXT,
     geolocation_city TEXT,
     geolocation_state TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_geolocation_snapshot ON bronze.geolocation(_snapshot_id);
 
 CREATE TABLE IF NOT EXISTS bronze.product_category_name_translation (
     product_category_name TEXT,
     product_category_name_english TEXT,
-    _snapshot_id TEXT,
-    _run_id UUID,
+    _snapshot_id TEXT DEFAULT NULLIF(current_setting('bronze.snapshot_id', true), ''),
+    _run_id UUID DEFAULT NULLIF(current_setting('bronze.run_id', true), '')::UUID,
     _inserted_at TIMESTAMPTZ DEFAULT NOW(),
-    _source_file TEXT
+    _source_file TEXT DEFAULT NULLIF(current_setting('bronze.source_file', true), '')
 );
 CREATE INDEX idx_bronze_prod_cat_translation_snapshot ON bronze.product_category_name_translation(_snapshot_id);
 
@@ -1,5 +1,8 @@
 """Bronze layer configuration."""
 
+import os
+import json
+import functools
 from pathlib import Path
 
 # Paths
@@ -31,8 +34,36 @@ def manifest_path(snapshot_id: str) -> Path:
     """ returns the path for a specific snapshots manifest. """
     return MANIFEST_DIR / f"{snapshot_id}.json"
 
+@functools.lru_cache(maxsize=1)
+def _latest_manifest_for(manifest_dir: str, dir_mtime_ns: int) -> Path | None:
+    """ newest manifest in the directory, cached per directory mtime. """
+    # scandir hands back the directory entries with their type already known, so only the mtime needs a stat
+    with os.scandir(manifest_dir) as it:
+        manifests = [(e.stat().st_mtime, e.path) for e in it if e.name.endswith(".json") and e.is_file()]
+    return Path(max(manifests)[1]) if manifests else None
+
 def latest_manifest_path() -> Path | None:
     """ returns the most recent modified manifest file or none. """
-    MANIFEST_DIR.mkdir(parents=True, exist_ok=True)
-    manifests = sorted(MANIFEST_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
-    return manifests[-1] if manifests else None
+    # adding or removing a manifest bumps the directory mtime, so a single stat tells if the cached answer is stale
+    manifest_dir = os.path.abspath(MANIFEST_DIR)
+    try:
+        dir_mtime_ns = os.stat(manifest_dir).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _latest_manifest_for(manifest_dir, dir_mtime_ns)
+
+def clear_manifest_cache():
+    """ forget the cached latest manifest, e.g. after a manifest file was rewritten in place or in tests. """
+    _latest_manifest_for.cache_clear()
+
+def read_manifest(path: Path) -> dict:
+    """ parse a manifest file, json.loads decodes the raw bytes itself so no separate text read is needed. """
+    return json.loads(path.read_bytes())
+
+def write_manifest(manifest: dict) -> Path:
+    """ write the manifest for its snapshot and return the path. """
+    path = manifest_path(manifest['snapshot_id'])
+    path.write_text(json.dumps(manifest, indent=2))
+    # overwriting an existing manifest doesn't touch the directory mtime, so drop the cached lookup
+    clear_manifest_cache()
+    return path
@@ -2,65 +2,124 @@
 Script to extract raw dataset from the kaggle API
 """
 
-import json
+import os
 import hashlib
 import zipfile
 import logging
-import csv
 from pathlib import Path
 from datetime import datetime, timezone
 from kaggle.api.kaggle_api_extended import KaggleApi
 
-from .config import KAGGLE_DATASET, RAW_BASE, MANIFEST_DIR, FILE_TO_TABLE, manifest_path, latest_manifest_path, raw_dir
+from .config import KAGGLE_DATASET, RAW_BASE, MANIFEST_DIR, FILE_TO_TABLE, latest_manifest_path, manifest_path, raw_dir, read_manifest, write_manifest
 
 logger = logging.getLogger(__name__)
 
 
 def compute_hash(filepath, algorithm='sha256'):
     """ compute file hash for deterministic snapshot ID. """
-    hasher = hashlib.new(algorithm)
+    # file_digest reads in large blocks and hashes them in C with the GIL released
     with open(filepath, 'rb') as f: 
-        for chunk in iter(lambda:f.read(8192), b""):
+        return hashlib.file_digest(f, algorithm).hexdigest()
+
+def _count_newlines(chunk: bytes, in_quotes: bool) -> tuple[int, bool]:
+    """
+    count the row breaks in a chunk of CSV bytes, returns the count and whether the chunk ends inside quotes.
+    newlines inside quoted fields (e.g. multi-line review comments) are not row breaks, 
+    so the chunk is split on quotes and only the newlines outside of them are counted.
+    """
+    lines = 0
+    for i, part in enumerate(chunk.split(b'"')):
+        # every split boundary is a quote character, escaped quotes ("") toggle twice
+        if i:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            lines += part.count(b"\n")
+    return lines, in_quotes
+
+def _extract_and_hash(zf: zipfile.ZipFile, member: zipfile.ZipInfo, dest: Path, algorithm='sha256') -> tuple[str, int]:
+    """
+    extract a zip member to disk, hashing its bytes and counting its CSV data rows (headers excluded) in the same pass.
+    """
+    hasher = hashlib.new(algorithm)
+    lines = 0
+    in_quotes = False
+    last_byte = b""
+    with zf.open(member) as src, open(dest, 'wb') as dst:
+        for chunk in iter(lambda: src.read(1 << 20), b""):
             hasher.update(chunk)
-    return hasher.hexdigest()
-
-def _source_changed() -> bool:
-    """ check if the kaggle dataset has been updated before downloading. """
-    api = KaggleApi()
-    api.authenticate()
-
+            dst.write(chunk)
+            chunk_lines, in_quotes = _count_newlines(chunk, in_quotes)
+            lines += chunk_lines
+            last_byte = chunk[-1:]
+
+    # the last row may not end with a newline
+    if last_byte and last_byte != b"\n":
+        lines += 1
+    return hasher.hexdigest(), max(lines - 1, 0)  # skip header
+
+def _fetch_kaggle_last_updated(api: KaggleApi) -> str | None:
+    """ look up the last updated timestamp of the kaggle dataset, none if it cant be found. """
     # since kaggle api uses fuzzy matching, we need to search for the exact dataset name
     dataset_list = api.dataset_list(search=KAGGLE_DATASET)
     dataset = next((d for d in dataset_list if str(d) == KAGGLE_DATASET), None)
+    return str(dataset.lastUpdated) if dataset else None
 
-    if dataset is None:
-        return True # this means we cant verify thus assume it has changed
-    
-    kaggle_last_updated = str(dataset.lastUpdated)
+def _source_changed() -> tuple[bool, str | None]:
+    """ 
+    check if the kaggle dataset has been updated before downloading. 
+    also returns the kaggle last updated timestamp, so extract can reuse it for the manifest.
+    """
+    api = KaggleApi()
+    api.authenticate()
+
+    kaggle_last_updated = _fetch_kaggle_last_updated(api)
+    if kaggle_last_updated is None:
+        return True, None # this means we cant verify thus assume it has changed
 
     # to compare against what we have in our last manifest
     path = latest_manifest_path()
     if path is not None:
-        manifest = json.loads(path.read_text())
+        manifest = read_manifest(path)
         if manifest.get('kaggle_last_updated') == kaggle_last_updated:
-            return False
+            return False, kaggle_last_updated
     
-    return True
-
-def _count_csv_rows(filepath: Path) -> int:
-    """count data rows in a CSV file (headers excluded)."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.reader(f)
-        next(reader)  # skip header
-        return sum(1 for _ in reader)
-
-def extract(force: bool = False) -> dict:
-    """ downloads dataset, extracts files and returns manifest. """
+    return True, kaggle_last_updated
+
+def _reusable_file_entries(snapshot_id: str, snapshot_dir: Path) -> dict[str, dict]:
+    """ 
+    manifest entries of an earlier extract of this snapshot whose file on disk is untouched.
+    a file counts as untouched when its size and mtime_ns still match what the manifest recorded.
+    """
+    path = manifest_path(snapshot_id)
+    if not path.exists():
+        return {}
+
+    reusable = {}
+    for entry in read_manifest(path).get('files', []):
+        try:
+            st = os.stat(snapshot_dir / entry['filename'])
+        except FileNotFoundError:
+            continue
+        if st.st_size == entry.get('size') and st.st_mtime_ns == entry.get('mtime_ns'):
+            reusable[entry['filename']] = entry
+    return reusable
+
+def extract(force: bool = False, on_file=None) -> dict:
+    """ 
+    downloads dataset, extracts files and returns manifest. 
+    on_file(snapshot_id, file_entry) is called for every contract file as soon as it is extracted, largest first,
+    with the same entry that ends up in the manifest. it is not called when the extract is skipped.
+    an exception raised by on_file stops the extract.
+    """
     # this try/except will proceed with download rather than failing, even if we cant check
+    kaggle_last_updated = None
+    metadata_fetched = False
     try:
-        if not force and not _source_changed():
+        changed, kaggle_last_updated = _source_changed()
+        metadata_fetched = True
+        if not force and not changed:
             logger.info('extract_skipped', extra={'reason': 'source_unchanged'})
-            return json.loads(latest_manifest_path().read_text())
+            return read_manifest(latest_manifest_path())
     except Exception as e:
         logger.warning('source_check_failed', extra={
             'error': str(e), 
@@ -77,14 +136,13 @@ def extract(force: bool = False) -> dict:
     api.authenticate()
     api.dataset_download_files(KAGGLE_DATASET, path=tmp_dir, unzip=False)
 
-    # get the last updated timestamp for the manifest
-    try:
-        dataset_list = api.dataset_list(search=KAGGLE_DATASET)
-        dataset = next((d for d in dataset_list if str(d) == KAGGLE_DATASET), None)
-        kaggle_last_updated = str(dataset.lastUpdated) if dataset else None
-    except Exception as e: 
-        logger.warning('kaggle_metadata_fetch_failed', extra={'error': str(e)}, exc_info =True)
-        kaggle_last_updated = None
+    # get the last updated timestamp for the manifest, only asking kaggle again if the source check failed
+    if not metadata_fetched:
+        try:
+            kaggle_last_updated = _fetch_kaggle_last_updated(api)
+        except Exception as e: 
+            logger.warning('kaggle_metadata_fetch_failed', extra={'error': str(e)}, exc_info =True)
+            kaggle_last_updated = None
 
     # hash the zip
     zip_path = next(tmp_dir.glob('*.zip'))
@@ -94,8 +152,41 @@ def extract(force: bool = False) -> dict:
     snapshot_dir = raw_dir(snapshot_id)
     snapshot_dir.mkdir(parents=True, exist_ok=True)
 
+    # a forced re-download of the same snapshot keeps the files that are still on disk untouched,
+    # so their hash and row count come from the old manifest instead of another full read
+    reused = _reusable_file_entries(snapshot_id, snapshot_dir)
+    if reused:
+        logger.info('extract_reusing_files', extra={'snapshot_id': snapshot_id, 'file_count': len(reused)})
+
+    # files are handed over largest first (LPT scheduling, like load), so the longest COPY doesn't start last.
+    # reused files are already on disk and go first, the zip members follow by their uncompressed size.
+    file_entries = dict(reused)
+    if on_file:
+        for entry in sorted(reused.values(), key=lambda e: e.get('size', 0), reverse=True):
+            on_file(snapshot_id, entry)
+
+    # the contract files are hashed and row counted while they are decompressed, so they are never read back from disk
     with zipfile.ZipFile(zip_path, 'r') as zf:
-        zf.extractall(snapshot_dir)
+        for member in sorted(zf.infolist(), key=lambda m: m.file_size, reverse=True):
+            if member.filename in reused:
+                continue
+            if member.filename in FILE_TO_TABLE:
+                dest = snapshot_dir / member.filename
+                file_hash, row_count = _extract_and_hash(zf, member, dest)
+                st = dest.stat()
+                entry = {
+                    'filename': member.filename,
+                    'hash': file_hash,
+                    'size': st.st_size,
+                    'mtime_ns': st.st_mtime_ns,
+                    'row_count': row_count,
+                }
+                file_entries[member.filename] = entry
+                # hand the file over as soon as it is complete, so loading can overlap the rest of the extract
+                if on_file:
+                    on_file(snapshot_id, entry)
+            else:
+                zf.extract(member, snapshot_dir)
     zip_path.unlink()
     tmp_dir.rmdir() # clean up temporary directory
 
@@ -104,17 +195,10 @@ def extract(force: bool = False) -> dict:
         'snapshot_id': snapshot_id,
         'extracted_at': datetime.now(timezone.utc).isoformat(),
         'kaggle_last_updated': kaggle_last_updated,
-        'files': [
-            {'filename': f, 
-            'hash': compute_hash(snapshot_dir / f), 
-            'size': (snapshot_dir / f).stat().st_size, 
-            'row_count': _count_csv_rows(snapshot_dir / f)}
-            for f in FILE_TO_TABLE.keys()
-            if (snapshot_dir / f).exists()
-        ],
+        'files': [file_entries[f] for f in FILE_TO_TABLE.keys() if f in file_entries],
     }
 
-    manifest_path(snapshot_id).write_text(json.dumps(manifest, indent=2))
+    write_manifest(manifest)
     logger.info('extract_completed', extra={
         'snapshot_id': snapshot_id,
         'file_count': len(manifest['files']),
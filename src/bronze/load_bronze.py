@@ -2,15 +2,18 @@
 Load raw csv into bronze layer
 """
 
-import json
+import os
 import uuid
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import List
+from pathlib import Path
+from typing import Callable, Iterable, List
+from psycopg2.extras import execute_values
 
-from .config import FILE_TO_TABLE, manifest_path, latest_manifest_path, raw_dir
-from db import get_db_connection, load_csv_via_temp_table, LoadResult, health_check
-from .quality_bronze import run_quality_checks, persist_quality_results
+from .config import FILE_TO_TABLE, manifest_path, latest_manifest_path, raw_dir, read_manifest
+from db import get_db_connection, load_csv_into_bronze, migrate_bronze_metadata_defaults, LoadResult, health_check
+from .quality_bronze import run_snapshot_quality_checks, persist_quality_results, fetch_bronze_schema
 from notification import PipelineOutcome, notify
 
 logger = logging.getLogger(__name__)
@@ -24,25 +27,29 @@ class LoadSummary:
     total_rows: int
     results: List[LoadResult]
 
-def _file_changed(conn, filename: str, new_hash:str) -> bool:
-    """ compare file hash against the last loaded hash in the database. """
-    with conn.cursor() as cur: 
+def _latest_file_hashes(conn) -> dict[str, str]:
+    """ fetch the last loaded hash of every file in one query, as {filename: file_hash}. """
+    # DISTINCT ON walks idx_file_manifest_filename (filename, created_at DESC) and keeps the newest row per file
+    with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT file_hash
+            SELECT DISTINCT ON (filename) filename, file_hash
             FROM ingestion.file_manifest
-            WHERE filename = %s
-            ORDER BY created_at DESC
-            LIMIT 1
-            """, (filename,))
-        row = cur.fetchone()
+            ORDER BY filename, created_at DESC
+            """)
+        return dict(cur.fetchall())
 
-    if row is None:
+def _file_changed(latest_hashes: dict[str, str], filename: str, new_hash: str) -> bool:
+    """ compare file hash against the last loaded hash from _latest_file_hashes. """
+    previous = latest_hashes.get(filename)
+    if previous is None:
         return True # no previous hash, so we assume the file has never been loaded before 
-    return row[0] != new_hash
+    return previous != new_hash
 
 def _record_file_manifest(conn, snapshot_id: str, filename: str, file_hash: str, file_size: int, row_count:int):
     """ record the file's metadata in the database after a successful load. """
+    # No conn.commit() on purpose so that the file's data, manifest, quality results 
+    # and load status are committed atomically as one unit.
     with conn.cursor() as cur:
         cur.execute(
             """
@@ -53,9 +60,9 @@ def _record_file_manifest(conn, snapshot_id: str, filename: str, file_hash: str,
                 file_size_bytes = EXCLUDED.file_size_bytes,
                 row_count = EXCLUDED.row_count
             """, (snapshot_id, filename, file_hash, file_size, row_count))
-    conn.commit()
 
 def _register_run(conn, run_id: str, snapshot_id: str):
+    # keep conn.commit() here to ensure monitoring can see a run was attempted.
     with conn.cursor() as cur:
         cur.execute(
             "INSERT INTO ingestion.runs (run_id, snapshot_id, layer, status) VALUES (%s, %s, 'bronze', 'started')",
@@ -74,29 +81,99 @@ def _complete_run(conn, run_id: str, status: str, error_message: str = None):
         )
     conn.commit()
 
-def _register_file_load(conn, run_id: str, file_name: str):
-    """ record a pending file load. """
+def _record_file_load(conn, run_id: str, file_name: str, status: str, rows_inserted: int = 0, message: str = None):
+    """ record the file load outcome for the run in a single upsert. """
+    # No conn.commit() on purpose, it is committed together with the rest of the file's transaction.
+    # a 'pending' row written at the start would be invisible until that same commit anyway,
+    # so the outcome is written once at the end instead of an insert plus an update.
     with conn.cursor() as cur:
         cur.execute(
             """
-            INSERT INTO ingestion.file_loads (run_id, filename, status)
-            VALUES (%s, %s, 'pending')
-            ON CONFLICT (run_id, filename) DO NOTHING
-            """, (run_id, file_name)
+            INSERT INTO ingestion.file_loads (run_id, filename, status, rows_inserted, message)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (run_id, filename) DO UPDATE
+            SET status = EXCLUDED.status,
+                rows_inserted = EXCLUDED.rows_inserted,
+                message = EXCLUDED.message,
+                updated_at = NOW()
+            """, (run_id, file_name, status, rows_inserted, message)
         )
-    conn.commit()
 
-def _complete_file_load(conn, run_id: str, file_name: str, status: str, rows_inserted: int = 0, message: str = None):
-    """ update file load status after attempt. """
+def _record_failed_file_loads(conn, run_id: str, failures: list[tuple[str, str]]):
+    """ record all failed file loads of the run, given as (file_name, message) pairs, in one statement. """
+    # No conn.commit() on purpose, the failures are committed together with the run status in _complete_run.
     with conn.cursor() as cur:
-        cur.execute(
+        execute_values(
+            cur,
             """
-            UPDATE ingestion.file_loads
-            SET status = %s, rows_inserted = %s, message = %s, updated_at = NOW()
-            WHERE run_id = %s AND filename = %s
-            """, (status, rows_inserted, message, run_id, file_name)
+            INSERT INTO ingestion.file_loads (run_id, filename, status, rows_inserted, message)
+            VALUES %s
+            ON CONFLICT (run_id, filename) DO UPDATE
+            SET status = EXCLUDED.status,
+                rows_inserted = EXCLUDED.rows_inserted,
+                message = EXCLUDED.message,
+                updated_at = NOW()
+            """,
+            [(run_id, file_name, message) for file_name, message in failures],
+            template="(%s, %s, 'failed', 0, %s)",
         )
-    conn.commit()
+
+def _raw_file_paths(snapshot_raw_dir: Path) -> dict[str, Path]:
+    """ 
+    locate every raw csv of the snapshot folder in one directory scan, falling back to a gzipped copy. 
+    returns {file_name: path} for the contract files that exist.
+    """
+    try:
+        with os.scandir(snapshot_raw_dir) as it:
+            present = {e.name for e in it if e.is_file()}
+    except FileNotFoundError:
+        return {}
+
+    paths = {}
+    for file_name in FILE_TO_TABLE:
+        for candidate in (file_name, f"{file_name}.gz"):
+            if candidate in present:
+                paths[file_name] = snapshot_raw_dir / candidate
+                break
+    return paths
+
+def _max_load_workers() -> int:
+    """ 
+    size the loader thread pool so every worker gets a connection and the pool keeps some headroom. 
+    each COPY keeps one postgres backend busy parsing, so by default there are no more workers than cores.
+    BRONZE_LOAD_WORKERS overrides the core count, e.g. for a remote database with more cores.
+    """
+    pool_max = int(os.getenv("DB_POOL_MAX", 20))
+    requested = int(os.getenv("BRONZE_LOAD_WORKERS", os.cpu_count() or 1))
+    return max(1, min(len(FILE_TO_TABLE), pool_max - 2, requested))
+
+def _load_file(run_id: str, snapshot_id: str, file_name: str, table_name: str, file_path, file_meta: dict | None) -> LoadResult:
+    """ 
+    load a single csv into its bronze table on a dedicated pooled connection. 
+    returns the load result, a failed load raises. quality checks run later for all tables at once, see load().
+    """
+    with get_db_connection() as conn:
+        # one transaction per file: bronze data, file manifest and load status commit together
+        try:
+            result = load_csv_into_bronze(conn, str(file_path), table_name, snapshot_id, run_id, file_name, commit=False)
+            logger.info('table_loaded', extra= {'table': table_name, 'rows_inserted':result.rows_inserted})
+
+            # record file manifest in database
+            if file_meta:
+                _record_file_manifest(conn, snapshot_id, file_name, file_meta['hash'], file_meta['size'], result.rows_inserted)
+
+            _record_file_load(conn, run_id, file_name, 'loaded', result.rows_inserted)
+            conn.commit()
+            return result
+
+        except Exception as e:
+            # discard the partial file transaction, load() records the failure with the others at the end of the run
+            conn.rollback()
+            logger.error('table_load_failed', extra = {
+                'table': table_name,
+                'error': str(e),
+            }, exc_info=True)
+            raise
 
 def load(snapshot_id: str = None, run_id: str = None) -> LoadSummary:
     """ load all csv from manifest into the bronze tables. """
@@ -106,24 +183,41 @@ def load(snapshot_id: str = None, run_id: str = None) -> LoadSummary:
         path = latest_manifest_path()
         if path is None:
             raise FileNotFoundError("No manifest found, try extract first.")
-        manifest = json.loads(path.read_text())
+        manifest = read_manifest(path)
         snapshot_id = manifest['snapshot_id']
     else: 
-        from .config import manifest_path as mp
-        mpath = mp(snapshot_id)
-        if mpath.exists():
-            manifest = json.loads(mpath.read_text())
-        else:
-            raise FileNotFoundError(f"No manifest found for snapshot: {snapshot_id}")
-    
-    snapshot_raw_dir = raw_dir(snapshot_id)
+        try:
+            manifest = read_manifest(manifest_path(snapshot_id))
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No manifest found for snapshot: {snapshot_id}") from None
 
     # build a hash lookup for the files in the manifest
     file_hashes = {f['filename']: f for f in manifest['files']}
-    
+    raw_paths = _raw_file_paths(raw_dir(snapshot_id))
+
+    # largest files first (LPT scheduling), so the longest COPY doesn't start last and leave a straggler.
+    # files without a manifest size keep their FILE_TO_TABLE order at the end, the sort is stable.
+    files = sorted(
+        ((file_name, raw_paths.get(file_name), file_hashes.get(file_name)) for file_name in FILE_TO_TABLE),
+        key=lambda item: (item[2] or {}).get('size', 0), reverse=True,
+    )
+    return load_files(snapshot_id, files, run_id)
+
+def load_files(snapshot_id: str, files: Iterable[tuple[str, Path | None, dict | None]], run_id: str = None,
+               extract_error: Callable[[], str | None] = None) -> LoadSummary:
+    """ 
+    load csv files of a snapshot into the bronze tables as they come in.
+    files yields (file_name, path or none when missing, manifest entry or none) and may be a generator
+    fed while the snapshot is still being extracted, each file is submitted as soon as it is yielded.
+    extract_error is asked once files is exhausted, when the extract feeding files failed it returns the error,
+    which fails the run, since the snapshot is then only partially loaded.
+    """
+    snapshot_raw_dir = raw_dir(snapshot_id)
     run_id = run_id or str(uuid.uuid4())
     results = []
     failed_tables = []
+    failed_files = []
+    expected_rows = {}
     all_dq_failures = []
 
     # database health check
@@ -132,65 +226,97 @@ def load(snapshot_id: str = None, run_id: str = None) -> LoadSummary:
         raise RuntimeError(f"database is unhealthy: {status}")
 
     with get_db_connection() as conn:
-        _register_run(conn, run_id, snapshot_id)
-
-        for file_name, table_name in FILE_TO_TABLE.items():
-            file_path = snapshot_raw_dir / file_name
-            if not file_path.exists():
-                logger.warning('file_missing', extra= {'filepath': str(file_path)})
-                continue
-
-            # hash check
-            file_meta = file_hashes.get(file_name)
-            if file_meta and not _file_changed(conn, file_name, file_meta['hash']):
-                logger.info('file_skipped', extra = {'file_name': file_name, 'reason': 'hash_unchanged'})
-                continue
-            
-            _register_file_load(conn, run_id, file_name)
-            # this try/except will catch the exception, log it, and not stop the if loop.
-            try:
-                result = load_csv_via_temp_table(conn, str(file_path), table_name, snapshot_id, run_id, file_name)
+        # COPY relies on the metadata column defaults, databases created before them are migrated first
+        migrate_bronze_metadata_defaults(conn)
+
+        # the hash gate for every file is answered by a single query, before anything is written
+        latest_hashes = _latest_file_hashes(conn)
+        conn.commit()
+
+        # each file targets its own bronze table, so the COPYs can run side by side on separate connections.
+        # files finish in any order, so nothing may assume an order between the per-file loads.
+        futures = {}
+        schema_cache = None
+        with ThreadPoolExecutor(max_workers=_max_load_workers()) as executor:
+            for file_name, file_path, file_meta in files:
+                table_name = FILE_TO_TABLE.get(file_name)
+                if table_name is None:
+                    continue
+                if file_path is None:
+                    logger.warning('file_missing', extra= {'filepath': str(snapshot_raw_dir / file_name)})
+                    continue
+
+                # hash check
+                if file_meta and not _file_changed(latest_hashes, file_name, file_meta['hash']):
+                    logger.info('file_skipped', extra = {'file_name': file_name, 'reason': 'hash_unchanged'})
+                    continue
+
+                # the run is only registered once there is a changed file, a rerun with nothing changed records no run
+                if not futures:
+                    _register_run(conn, run_id, snapshot_id)
+                    # the bronze tables schema doesn't change during a run, so the catalog is read once for all schema checks
+                    schema_cache = fetch_bronze_schema(conn)
+                    conn.commit()  # don't leave the main connection idle in a transaction while the files load
+
+                future = executor.submit(
+                    _load_file, run_id, snapshot_id, file_name, table_name, file_path, file_meta
+                )
+                futures[future] = (file_name, table_name, file_meta)
+
+            # files is exhausted here, so the extract has finished one way or the other
+            extract_failed = extract_error() if extract_error else None
+
+            if not futures:
+                logger.info('nothing_to_do', extra={'snapshot_id': snapshot_id, 'reason': 'no_changed_files'})
+                return LoadSummary(run_id=run_id, snapshot_id=snapshot_id, tables_loaded=0, total_rows=0, results=[])
+
+            for future in as_completed(futures):
+                file_name, table_name, file_meta = futures[future]
+                # load failures are logged by the worker and recorded in ingestion.file_loads below in one batch
+                try:
+                    result = future.result()
+                except Exception as e:
+                    failed_tables.append(table_name)
+                    failed_files.append((file_name, str(e)))
+                    continue
+
                 results.append(result)
-                logger.info('table_loaded', extra= {'table': table_name, 'rows_inserted':result.rows_inserted})
-
-                # record file manifest in database
-                if file_meta:
-                    _record_file_manifest(conn, snapshot_id, file_name, file_meta['hash'], file_meta['size'], result.rows_inserted)
-                
-                # run quality checks
-                manifest_row_count = file_meta.get('row_count') if file_meta else None
-                dq_results = run_quality_checks(conn, table_name, snapshot_id, manifest_row_count)
-                persist_quality_results(conn, run_id, dq_results)
-                
-                failed_checks = [r for r in dq_results if not r.passed and r.severity == 'error']
-                if failed_checks:
-                    all_dq_failures.extend(failed_checks)
-                    logger.warning('dq_checks_failed', extra = {
-                        'table': table_name,
-                        'failed': [r.check_name for r in failed_checks],
-                    })
-                    
-                _complete_file_load(conn, run_id, file_name, 'loaded', result.rows_inserted)
-
-            except Exception as e:
-                failed_tables.append(table_name)
-                logger.error('table_load_failed', extra = {
+                expected_rows[table_name] = file_meta.get('row_count') if file_meta else None
+
+        # quality checks run once all COPYs are done: one count query for every loaded table,
+        # their results commit together with the run status below
+        dq_error = None
+        try:
+            dq_results = run_snapshot_quality_checks(conn, expected_rows, snapshot_id, schema_cache)
+            persist_quality_results(conn, run_id, dq_results)
+        except Exception as e:
+            conn.rollback()
+            logger.error('quality_checks_failed', extra={'run_id': run_id, 'error': str(e)}, exc_info=True)
+            dq_error = str(e)
+        else:
+            all_dq_failures = [r for r in dq_results if not r.passed and r.severity == 'error']
+            for table_name in dict.fromkeys(r.table for r in all_dq_failures):
+                logger.warning('dq_checks_failed', extra = {
                     'table': table_name,
-                    'error': str(e),
-                }, exc_info=True)
-                _complete_file_load(conn, run_id, file_name, 'failed', message = str(e))
-                # continue loading remaining tables
-                
-        if failed_tables: 
+                    'failed': [r.check_name for r in all_dq_failures if r.table == table_name],
+                })
+
+        if failed_tables or dq_error or extract_failed is not None: 
             run_status = 'failed'
         elif all_dq_failures:
             run_status = 'success_with_warnings'
         else:
             run_status = 'success'
 
-        error_msg = None
+        errors = []
         if failed_tables:
-            error_msg = f"failed tables: {failed_tables}"
+            errors.append(f"failed tables: {failed_tables}")
+            _record_failed_file_loads(conn, run_id, failed_files)
+        if dq_error:
+            errors.append(f"quality checks failed: {dq_error}")
+        if extract_failed is not None:
+            errors.append(f"extract failed: {extract_failed}")
+        error_msg = "; ".join(errors) or None
         _complete_run(conn, run_id, run_status, error_msg)
 
         if failed_tables:
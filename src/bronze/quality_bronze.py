@@ -3,8 +3,10 @@ Bronze layer quality checks.
 """
 
 import logging
+import functools
 from dataclasses import dataclass
 from psycopg2 import sql, extensions
+from psycopg2.extras import Json, execute_values
 
 logger = logging.getLogger(__name__)
 
@@ -30,8 +32,8 @@ PRIMARY_KEYS = {
     "product_category_name_translation": ["product_category_name"],
 }
 
-def check_row_count(conn: extensions.connection, table_name: str, snapshot_id: str, expected_rows: int | None) -> QualityResult:
-    """ check if the row count matches the expected value from manifest. """
+def _row_count_result(table_name: str, expected_rows: int | None, actual: int) -> QualityResult:
+    """ build the row_count result from an already counted snapshot. """
     if expected_rows is None:
         return QualityResult(
             table = table_name,
@@ -41,13 +43,6 @@ def check_row_count(conn: extensions.connection, table_name: str, snapshot_id: s
             details = {'skipped': True, 'reason': 'no manifest row count'},
         )
 
-    target = sql.Identifier('bronze', table_name)
-    with conn.cursor() as cur:
-        cur.execute(
-            sql.SQL("SELECT COUNT(*) FROM {} WHERE _snapshot_id = %s").format(target), (snapshot_id,)
-        )
-        actual = cur.fetchone()[0]
-
     passed = actual == expected_rows
     result = QualityResult(
         table = table_name,
@@ -64,16 +59,8 @@ def check_row_count(conn: extensions.connection, table_name: str, snapshot_id: s
         })
     return result
 
-
-def check_not_empty(conn:extensions.connection, table_name: str, snapshot_id: str) -> QualityResult:
-    """ Verify table has at least one row for this snapshot. """
-    target = sql.Identifier('bronze', table_name)
-    with conn.cursor() as cur:
-        cur.execute(
-            sql.SQL("SELECT COUNT(*) FROM {} WHERE _snapshot_id = %s").format(target), (snapshot_id,)
-        )
-        count = cur.fetchone()[0]
-    
+def _not_empty_result(table_name: str, count: int) -> QualityResult:
+    """ build the not_empty result from an already counted snapshot. """
     passed = count > 0
     result = QualityResult(
         table = table_name,
@@ -86,59 +73,111 @@ def check_not_empty(conn:extensions.connection, table_name: str, snapshot_id: st
         logger.error('dq_table_empty', extra={'table': table_name})
     return result
 
-def check_primary_key_nulls(conn: extensions.connection, table_name: str, snapshot_id: str) -> list[QualityResult]:
-    """ check null rate on primary key columns for this snapshot. """
-    results = []
-    pk_cols = PRIMARY_KEYS.get(table_name, [])
-    target = sql.Identifier('bronze', table_name)
+def _pk_null_result(table_name: str, col: str, total: int, null_count: int) -> QualityResult:
+    """ build the pk_null result for one primary key column from already counted nulls. """
+    null_rate = null_count / total if total > 0 else 0
+    passed = null_count == 0
 
-    for col in pk_cols: 
-        with conn.cursor() as cur:
-            cur.execute(
-                sql.SQL(
-                    """
-                    SELECT COUNT(*) AS total,
-                    COUNT(*) FILTER (WHERE {} IS NULL) AS null_count
-                    FROM {}
-                    WHERE _snapshot_id = %s 
-                    """
-                ).format(sql.Identifier(col), target), (snapshot_id,)
-            )
-            total, null_count = cur.fetchone()
-        null_rate = null_count / total if total > 0 else 0
-        passed = null_count == 0
+    result = QualityResult(
+        table = table_name,
+        check_name = f"pk_null_{col}",
+        passed = passed, 
+        severity = 'error',
+        details = {
+            'column': col,
+            'total': total,
+            'null_count': null_count,
+            'null_rate': round(null_rate, 4),
+        }
+    )
+    if not passed: 
+        logger.warning('dq_pk_nulls', extra={'table': table_name, **result.details})
+    return result
 
-        result = QualityResult(
-            table = table_name,
-            check_name = f"pk_null_{col}",
-            passed = passed, 
-            severity = 'error',
-            details = {
-                'column': col,
-                'total': total,
-                'null_count': null_count,
-                'null_rate': round(null_rate, 4),
-            }
-        )
-        if not passed: 
-            logger.warning('dq_pk_nulls', extra={'table': table_name, **result.details})
-        results.append(result)
-    
-    return results
+@functools.lru_cache(maxsize=None)
+def _snapshot_counts_query(table_name: str) -> sql.Composed:
+    """ 
+    compose the fused count query for a table once, the table and its primary keys are fixed. 
+    every table yields the same row shape (table name, row count, pk null counts as an array), 
+    so the queries of several tables can be combined with UNION ALL.
+    """
+    null_counts = [
+        sql.SQL("COUNT(*) FILTER (WHERE {} IS NULL)").format(sql.Identifier(col)) for col in PRIMARY_KEYS.get(table_name, [])
+    ]
+    return sql.SQL("SELECT {}::text, COUNT(*), ARRAY[{}]::bigint[] FROM {} WHERE _snapshot_id = %s").format(
+        sql.Literal(table_name), sql.SQL(', ').join(null_counts), sql.Identifier('bronze', table_name)
+    )
+
+def _fetch_snapshot_counts(conn: extensions.connection, table_names: list[str], snapshot_id: str) -> dict[str, tuple[int, dict[str, int]]]:
+    """ 
+    count the snapshot's rows and the nulls of every primary key column, one scan per table and one query for all tables.
+    returns {table: (row count, {pk column: null count})}.
+    """
+    query = sql.SQL(" UNION ALL ").join(_snapshot_counts_query(t) for t in table_names)
+    with conn.cursor() as cur:
+        cur.execute(query, (snapshot_id,) * len(table_names))
+        rows = cur.fetchall()
+    return {
+        table_name: (total, dict(zip(PRIMARY_KEYS.get(table_name, []), null_counts)))
+        for table_name, total, null_counts in rows
+    }
 
+# the single-check helpers read the same fused count as run_snapshot_quality_checks, run that for several checks or tables
+
+def check_row_count(conn: extensions.connection, table_name: str, snapshot_id: str, expected_rows: int | None) -> QualityResult:
+    """ check if the row count matches the expected value from manifest. """
+    if expected_rows is None:
+        return _row_count_result(table_name, expected_rows, 0)
+    total, _ = _fetch_snapshot_counts(conn, [table_name], snapshot_id)[table_name]
+    return _row_count_result(table_name, expected_rows, total)
+
+
+def check_not_empty(conn:extensions.connection, table_name: str, snapshot_id: str) -> QualityResult:
+    """ Verify table has at least one row for this snapshot. """
+    total, _ = _fetch_snapshot_counts(conn, [table_name], snapshot_id)[table_name]
+    return _not_empty_result(table_name, total)
+
+def check_primary_key_nulls(conn: extensions.connection, table_name: str, snapshot_id: str) -> list[QualityResult]:
+    """ check null rate on primary key columns for this snapshot. """
+    if not PRIMARY_KEYS.get(table_name):
+        return []
+    total, null_counts = _fetch_snapshot_counts(conn, [table_name], snapshot_id)[table_name]
+    return [_pk_null_result(table_name, col, total, n) for col, n in null_counts.items()]
 
-def check_schema(conn: extensions.connection, table_name: str) -> QualityResult:
-    """ verify bronze table schema has the expected columns. """
+
+def fetch_bronze_schema(conn: extensions.connection) -> dict[str, set[str]]:
+    """ read the columns of every bronze table in one catalog query, grouped as {table: {columns}}. """
+    schema: dict[str, set[str]] = {}
     with conn.cursor() as cur:
         cur.execute(
             """
-            SELECT column_name
+            SELECT table_name, column_name
             FROM information_schema.columns
-            WHERE table_schema = 'bronze' AND table_name = %s
-            ORDER BY ordinal_position
-            """, (table_name,)
+            WHERE table_schema = 'bronze'
+            """
         )
-        actual_cols = {row[0] for row in cur.fetchall()}
+        for table_name, column_name in cur.fetchall():
+            schema.setdefault(table_name, set()).add(column_name)
+    return schema
+
+def check_schema(conn: extensions.connection, table_name: str, schema_cache: dict[str, set[str]] | None = None) -> QualityResult:
+    """ 
+    verify bronze table schema has the expected columns. 
+    schema_cache is the output of fetch_bronze_schema, without it the table's columns are queried directly.
+    """
+    if schema_cache is not None:
+        actual_cols = schema_cache.get(table_name, set())
+    else:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                SELECT column_name
+                FROM information_schema.columns
+                WHERE table_schema = 'bronze' AND table_name = %s
+                ORDER BY ordinal_position
+                """, (table_name,)
+            )
+            actual_cols = {row[0] for row in cur.fetchall()}
 
     # primary keys and metadata columns should always exist
     pk_cols = set(PRIMARY_KEYS.get(table_name, []))
@@ -165,29 +204,47 @@ def check_schema(conn: extensions.connection, table_name: str) -> QualityResult:
         )
     return result
 
-def run_quality_checks(conn: extensions.connection, table_name: str, snapshot_id: str, expected_rows: int | None) -> list[QualityResult]:
-    """ run all bronze layer quality checks for a table and persist results. """
+def run_snapshot_quality_checks(conn: extensions.connection, expected_rows: dict[str, int | None], snapshot_id: str,
+                                schema_cache: dict[str, set[str]] | None = None) -> list[QualityResult]:
+    """ 
+    run all bronze layer quality checks for several tables of a snapshot at once.
+    expected_rows maps every table to its manifest row count (none skips the row_count check).
+    not_empty, row_count and pk_nulls come from one UNION ALL count query, the schema check from schema_cache.
+    """
+    if not expected_rows:
+        return []
+    if schema_cache is None:
+        schema_cache = fetch_bronze_schema(conn)
+    counts = _fetch_snapshot_counts(conn, list(expected_rows), snapshot_id)
+
     results = []
-    results.append(check_not_empty(conn, table_name, snapshot_id))
-    results.append(check_row_count(conn, table_name, snapshot_id, expected_rows))
-    results.append(check_schema(conn, table_name))
-    results.extend(check_primary_key_nulls(conn, table_name, snapshot_id))
-    
+    for table_name, expected in expected_rows.items():
+        total, null_counts = counts[table_name]
+        results.append(_not_empty_result(table_name, total))
+        results.append(_row_count_result(table_name, expected, total))
+        results.append(check_schema(conn, table_name, schema_cache))
+        results.extend(_pk_null_result(table_name, col, total, n) for col, n in null_counts.items())
+
     return results
 
+def run_quality_checks(conn: extensions.connection, table_name: str, snapshot_id: str, expected_rows: int | None, 
+                       schema_cache: dict[str, set[str]] | None = None) -> list[QualityResult]:
+    """ run all bronze layer quality checks for a single table, see run_snapshot_quality_checks. """
+    return run_snapshot_quality_checks(conn, {table_name: expected_rows}, snapshot_id, schema_cache)
+
 def persist_quality_results(conn: extensions.connection, run_id: str, results: list[QualityResult]):
-    """ Write quality check results to the database. """
-    import json
+    """ Write quality check results to the database in one batched insert, the caller commits. """
+    rows = [(run_id, res.table, res.check_name, res.passed, res.severity, Json(res.details)) for res in results]
     with conn.cursor() as cur:
-        for res in results:
-            cur.execute(
-                """
-                INSERT INTO ingestion.quality_checks (run_id, table_name, check_name, passed, severity, details)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (run_id, table_name, check_name) DO UPDATE
-                SET passed = EXCLUDED.passed, severity = EXCLUDED.severity, 
-                    details = EXCLUDED.details, checked_at = NOW()
-                """, 
-                (run_id, res.table, res.check_name, res.passed, res.severity, json.dumps(res.details)),
-            )
-    conn.commit()
+        execute_values(
+            cur,
+            """
+            INSERT INTO ingestion.quality_checks (run_id, table_name, check_name, passed, severity, details)
+            VALUES %s
+            ON CONFLICT (run_id, table_name, check_name) DO UPDATE
+            SET passed = EXCLUDED.passed, severity = EXCLUDED.severity, 
+                details = EXCLUDED.details, checked_at = NOW()
+            """,
+            rows,
+            page_size=500,
+        )
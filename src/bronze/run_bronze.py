@@ -3,13 +3,94 @@ An orchestrator with CLI interface to run the bronze layer pipeline
 """
 import argparse
 import logging
+import queue
 import sys
+import threading
 from logging_config import setup_logging
+from .config import raw_dir
 from .extract_bronze import extract
-from .load_bronze import load
+from .load_bronze import load, load_files, LoadSummary
 
 logger = logging.getLogger(__name__)
 
+# extracted files waiting to be loaded, a small bound keeps the extract from running far ahead of the loader
+FILE_QUEUE_SIZE = 4
+
+_DONE = object()
+
+class _LoadStopped(Exception):
+    """ raised in the extract thread once the loader has given up, so the extract stops early. """
+
+def extract_and_load(force: bool = False) -> tuple[dict, LoadSummary]:
+    """ 
+    run extract in a producer thread and load every file as soon as it is extracted.
+    the manifest is still written by extract once all files are out, the loads overlap with the rest of the extract.
+    when the extract is skipped (source unchanged), the existing manifest is loaded as usual.
+    a failed extract fails the load run, a failed load stops the extract.
+    """
+    files = queue.Queue(maxsize=FILE_QUEUE_SIZE)
+    stop = threading.Event()
+    outcome = {}
+
+    def _hand_over(snapshot_id, entry):
+        if stop.is_set():
+            raise _LoadStopped()
+        files.put((snapshot_id, entry))
+
+    def _produce():
+        try:
+            outcome['manifest'] = extract(force=force, on_file=_hand_over)
+        except BaseException as e:
+            outcome['error'] = e
+        finally:
+            files.put(_DONE)
+
+    producer = threading.Thread(target=_produce, name='bronze-extract', daemon=True)
+    producer.start()
+
+    drained = False
+
+    def _ready_files(first):
+        nonlocal drained
+        item = first
+        while item is not _DONE:
+            snapshot_id, entry = item
+            yield entry['filename'], raw_dir(snapshot_id) / entry['filename'], entry
+            item = files.get()
+        drained = True
+
+    def _extract_error():
+        # the producer records its error before it puts _DONE, so this is settled once files is exhausted.
+        # the type name keeps the message non-empty for exceptions without one, e.g. MemoryError()
+        error = outcome.get('error')
+        if error is None:
+            return None
+        return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+    summary = None
+    try:
+        first = files.get()
+        if first is _DONE:
+            drained = True
+        else:
+            summary = load_files(first[0], _ready_files(first), extract_error=_extract_error)
+    finally:
+        if not drained:
+            # a load that stopped early tells the extract to stop at its next file,
+            # and must not leave the producer blocked on a full queue until then
+            stop.set()
+            while not drained:
+                drained = files.get() is _DONE
+
+    producer.join()
+    if 'error' in outcome:
+        raise outcome['error']
+
+    manifest = outcome['manifest']
+    if summary is None:
+        summary = load(snapshot_id=manifest['snapshot_id'])
+    return manifest, summary
+
 def main():
     parser = argparse.ArgumentParser(description = 'Bronze layer pipeline')
     parser.add_argument('--extract-only', action = 'store_true', help = 'only extract the data, no loading')
@@ -29,9 +110,8 @@ def main():
             manifest = extract(force=args.force)
             logger.info("extract completed", extra= {'snapshot_id': manifest['snapshot_id']})
         else:
-            # the full pipeline
-            manifest = extract(force=args.force)
-            summary = load(snapshot_id=manifest['snapshot_id'])
+            # the full pipeline, files are loaded while the rest of the snapshot is still being extracted
+            manifest, summary = extract_and_load(force=args.force)
             logger.info("pipeline completed", extra={
                 'total_rows': summary.total_rows, 
                 'snapshot_id': manifest['snapshot_id'],
@@ -3,31 +3,34 @@ Database connection and loading utility for Olist data warehouse.
 
 this module provides:
 - connection pooling with automatic retries on transient errors.
-- secure csv loading via temp table pattern with metadata tracking.
+- secure csv loading via COPY with metadata tracking.
 - idempotent loading with snapshot-based deduplication.
 - health monitoring for database connections.
 
 Usage:
- from db import get_db_connection, load_csv_via_temp_table
+ from db import get_db_connection, load_csv_into_bronze
 
  with get_db_connection() as conn:
-     load_csv_via_temp_table(conn, "Data/orders.csv", "orders", "2024-01-01", "run-123")
+     load_csv_into_bronze(conn, "Data/orders.csv", "orders", "2024-01-01", "run-123")
 Exports:
  - get_db_connection: Context manager for pooled connections
- - load_csv_via_temp_table: Idempotent CSV loader for bronze layer
+ - load_csv_into_bronze: Idempotent CSV loader for bronze layer
+ - migrate_bronze_metadata_defaults: Idempotent migration of the bronze metadata column defaults
  - health_check: Database connectivity check
  - close_pool: Graceful shutdown
 """
 
 import os 
+import gzip
 import logging
+import functools
 from contextlib import contextmanager
 from typing import Generator, Optional
 from dataclasses import dataclass
 import time
+import random
 import psycopg2
 from psycopg2 import pool, sql, extensions, OperationalError, InterfaceError
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
 # configure logger
 logger = logging.getLogger(__name__)
@@ -46,7 +49,8 @@ __all__ = [
     # Health
     "health_check",
     # Loading
-    "load_csv_via_temp_table",
+    "load_csv_into_bronze",
+    "migrate_bronze_metadata_defaults",
     # Constants
     "ALLOWED_TABLES",
 ]
@@ -114,6 +118,24 @@ ALLOWED_TABLES = {
 
 METADATA_COLS = ['_snapshot_id', '_run_id', '_inserted_at', '_source_file']
 
+# the loader only COPYs the CSV columns, the metadata columns are filled by these defaults.
+# they match docker/initdb/02_bronze_ddl.sql, migrate_bronze_metadata_defaults adds them to older databases.
+METADATA_DEFAULTS = {
+    '_snapshot_id': "NULLIF(current_setting('bronze.snapshot_id', true), '')",
+    '_run_id': "NULLIF(current_setting('bronze.run_id', true), '')::UUID",
+    '_inserted_at': "NOW()",
+    '_source_file': "NULLIF(current_setting('bronze.source_file', true), '')",
+}
+
+# attempts at getting a connection from the pool before giving up
+ACQUIRE_ATTEMPTS = 3
+
+# bytes copy_expert reads from the file per COPY data message, psycopg2's default is only 8 KiB
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+# connections idle in the pool for longer than this are pinged before they are handed out
+IDLE_PING_SEC = int(os.getenv("DB_IDLE_PING_SEC", 30))
+
 
 ##########################################
 ############   module state   ############
@@ -122,6 +144,12 @@ METADATA_COLS = ['_snapshot_id', '_run_id', '_inserted_at', '_source_file']
 # define global connection pool
 _DB_POOL: Optional[pool.ThreadedConnectionPool] = None
 
+# monotonic time each pooled connection was last returned, keyed by id(conn) like the pool itself
+_RETURNED_AT: dict[int, float] = {}
+
+# CSV column list per bronze table, the bronze DDL does not change while the pipeline runs
+_CSV_COLUMNS: dict[str, list[str]] = {}
+
 
 ####################################
 ############   config   ############
@@ -143,6 +171,11 @@ def _validate_config() -> dict:
         "password": os.getenv("POSTGRES_PASSWORD"),
         "port": os.getenv("POSTGRES_PORT"),
         "connect_timeout": int(os.getenv("DB_CONNECT_TIMEOUT", 10)),
+        # tcp keepalives keep idle pooled connections from being silently dropped by NAT/firewalls
+        "keepalives": 1,
+        "keepalives_idle": int(os.getenv("DB_KEEPALIVES_IDLE", 30)),
+        "keepalives_interval": int(os.getenv("DB_KEEPALIVES_INTERVAL", 10)),
+        "keepalives_count": int(os.getenv("DB_KEEPALIVES_COUNT", 5)),
     }
 
 
@@ -182,6 +215,7 @@ def close_pool() -> None:
     if _DB_POOL:
         _DB_POOL.closeall()
         _DB_POOL = None
+        _RETURNED_AT.clear()
         logger.info("pool_closed")
     else:
         logger.info("pool_already_closed")
@@ -191,15 +225,35 @@ def close_pool() -> None:
 ############   connection management   ############
 ###################################################
 
-# retry on transient errors
-@retry(retry=retry_if_exception_type((OperationalError, InterfaceError)), 
-       stop=stop_after_attempt(3), 
-       wait=wait_exponential(multiplier=0.5, min=1, max=5))
 def _acquire_connection() -> extensions.connection:
-    """ helper to retry pool access """
-    if _DB_POOL is None:
-        _init_db_pool()
-    return _DB_POOL.getconn()
+    """ helper to retry pool access on transient errors, exponential backoff with jitter. """
+    for attempt in range(ACQUIRE_ATTEMPTS):
+        try:
+            if _DB_POOL is None:
+                _init_db_pool()
+            return _DB_POOL.getconn()
+        except (OperationalError, InterfaceError):
+            if attempt == ACQUIRE_ATTEMPTS - 1:
+                raise
+            backoff = min(5, max(1, 0.5 * 2 ** attempt))
+            time.sleep(backoff * random.uniform(0.5, 1.5))
+
+def _checkout_connection() -> extensions.connection:
+    """
+    take a live connection from the pool, discarding stale ones.
+    only a connection that sat idle in the pool for a while is worth a ping,
+    the server or a firewall may have dropped it in the meantime. after a
+    server restart every idle connection is stale, so keep going until one
+    answers or the pool hands out a fresh connection.
+    """
+    while True:
+        # use retry logic to acquire connection
+        conn = _acquire_connection()
+        returned_at = _RETURNED_AT.pop(id(conn), None)
+        if returned_at is None or time.monotonic() - returned_at <= IDLE_PING_SEC or _is_alive(conn):
+            return conn
+        _DB_POOL.putconn(conn, close=True)
+        logger.info("stale_connection_discarded")
 
 @contextmanager
 def get_db_connection() -> Generator[extensions.connection, None, None]: 
@@ -210,13 +264,14 @@ def get_db_connection() -> Generator[extensions.connection, None, None]:
     if _DB_POOL is None:
         _init_db_pool()
 
-    # use retry logic to acquire connection
-    conn = _acquire_connection()
+    conn = _checkout_connection()
 
+    broken = False
     try:
         yield conn
     # rollback on error - reset connection state before returning to pool
     except (OperationalError, InterfaceError) as e:
+        broken = True
         logger.error("connection_error", extra={"error": str(e)}, exc_info=True)
         if conn:
             conn.rollback()
@@ -228,11 +283,16 @@ def get_db_connection() -> Generator[extensions.connection, None, None]:
     finally:
         if conn:
             # close connection if it is broken
-            if conn.closed or not _is_alive(conn):
+            if conn.closed or broken:
                 _DB_POOL.putconn(conn, close=True)
             else:
                 # return connection to pool
+                _RETURNED_AT[id(conn)] = time.monotonic()
                 _DB_POOL.putconn(conn)
+                # the pool closes returned connections beyond minconn, and a later
+                # connection may reuse this id()
+                if conn.closed:
+                    _RETURNED_AT.pop(id(conn), None)
                 logger.debug("connection_returned")
 
 
@@ -270,6 +330,7 @@ def _is_alive(conn: extensions.connection) -> bool:
     try:
         with conn.cursor() as cur:
             cur.execute("SELECT 1")
+        conn.rollback() # don't leave the ping's transaction open for the next user
         return True
     except (OperationalError, InterfaceError):
         return False
@@ -278,13 +339,87 @@ def _is_alive(conn: extensions.connection) -> bool:
 ############   data loading   ############
 ##########################################
 
-def load_csv_via_temp_table(conn: extensions.connection, csv_path: str, table_name: str, snapshot_id: str, run_id: str, source_file: str) -> LoadResult:
+def migrate_bronze_metadata_defaults(conn: extensions.connection) -> list[str]:
     """ 
-    load a CSV file into a bronze table using a temp table pattern. 
-    1. create temp table (matching/inherits target structure).
-    2. drop metadata columns from temp table so it matches CSV exactly.
-    3. copy data from CSV.
-    4. insert into target table with metadata.
+    idempotent migration that sets the metadata column defaults on bronze tables created before they existed.
+    the initdb DDL only runs on a fresh volume, so an existing database is migrated here instead.
+    only columns without a default are altered, returns them as 'table.column'.
+    """
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'bronze' AND column_name = ANY(%s) AND column_default IS NULL
+            ORDER BY table_name, column_name
+            """, (list(METADATA_DEFAULTS),))
+        missing = [(t, c) for t, c in cur.fetchall() if t in ALLOWED_TABLES]
+
+        for table_name, column_name in missing:
+            # the default expressions are constants of this module, only the identifiers are composed
+            cur.execute(
+                sql.SQL("ALTER TABLE {} ALTER COLUMN {} SET DEFAULT " + METADATA_DEFAULTS[column_name]).format(
+                    sql.Identifier('bronze', table_name), sql.Identifier(column_name)
+                )
+            )
+    conn.commit()
+    # cached column lists were validated against the old defaults
+    _CSV_COLUMNS.clear()
+
+    migrated = [f"{t}.{c}" for t, c in missing]
+    if migrated:
+        logger.warning("bronze_metadata_defaults_migrated", extra={"columns": migrated})
+    return migrated
+
+def _csv_columns(cur: extensions.cursor, table_name: str) -> list[str]:
+    """ 
+    business columns of a bronze table in ordinal order, which is the column layout of its CSV.
+    raises LoadError when a metadata column has no default, COPY would otherwise silently fill it with NULL.
+    """
+    if table_name not in _CSV_COLUMNS:
+        cur.execute(
+            """
+            SELECT column_name, column_default
+            FROM information_schema.columns
+            WHERE table_schema = 'bronze' AND table_name = %s
+            ORDER BY ordinal_position
+            """, (table_name,))
+        rows = cur.fetchall()
+        columns = [name for name, _ in rows if name not in METADATA_COLS]
+        if not columns:
+            return columns # table not found, don't cache so a later fix of the DDL is picked up
+
+        defaults = {name: default for name, default in rows if name in METADATA_COLS}
+        without_default = [col for col in METADATA_COLS if defaults.get(col) is None]
+        if without_default:
+            raise LoadError(table_name, f"metadata columns without default {without_default}, run migrate_bronze_metadata_defaults")
+        _CSV_COLUMNS[table_name] = columns
+    return _CSV_COLUMNS[table_name]
+
+@functools.lru_cache(maxsize=64)
+def _compile_queries(table_name: str, columns: tuple[str, ...]) -> dict[str, sql.Composed]:
+    """ build the load statements for a bronze table once, they only depend on the table and its columns. """
+    target_table = sql.Identifier("bronze", table_name)
+    return {
+        'snapshot_counts': sql.SQL(
+            "SELECT COUNT(*) FILTER (WHERE _snapshot_id = %s), "
+            "COUNT(*) FILTER (WHERE _snapshot_id IS DISTINCT FROM %s) FROM {};"
+        ).format(target_table),
+        'truncate': sql.SQL("TRUNCATE {};").format(target_table),
+        'delete': sql.SQL("DELETE FROM {} WHERE _snapshot_id = %s;").format(target_table),
+        'copy': sql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv, HEADER true)").format(
+            target_table, sql.SQL(', ').join(map(sql.Identifier, columns))
+        ),
+    }
+
+def load_csv_into_bronze(conn: extensions.connection, csv_path: str, table_name: str, snapshot_id: str, run_id: str, source_file: str, commit: bool = True) -> LoadResult:
+    """ 
+    load a CSV file (plain or .gz) from the Data/ directory into a bronze table in a single transaction. 
+    1. set the transaction-local metadata settings that the bronze column defaults read.
+    2. delete existing rows for the snapshot (truncate when it is the only snapshot in the table).
+    3. copy data from the file straight into the business columns of the target table.
+    the delete and the copy commit together, so a failed file never leaves a partial load behind.
+    pass commit=False to leave the transaction open, so the caller can commit its bookkeeping with the data.
     """
     # validate table name against allowlist for security
     if table_name not in ALLOWED_TABLES:
@@ -304,60 +439,53 @@ def load_csv_via_temp_table(conn: extensions.connection, csv_path: str, table_na
 
     start_time = time.time()
 
-    # unique temp table names to avoid collisions
-    tmp_table_name = f"tmp_{table_name}_{run_id.replace('-', '')}"
-
     # database operations
     try:
         with conn.cursor() as cur:
-            # defining identifiers safely
-            tmp_table = sql.Identifier(tmp_table_name)
-            target_table = sql.Identifier("bronze", table_name)
-
-            # create temp table
-            query = sql.SQL("CREATE TEMP TABLE {} (LIKE {} INCLUDING ALL) ON COMMIT DROP;").format(tmp_table, target_table)
-            cur.execute(query)
-
-            # drop metadata columns
-            for col in METADATA_COLS:
-                query = sql.SQL("ALTER TABLE {} DROP COLUMN IF EXISTS {};").format(tmp_table, sql.Identifier(col))
-                cur.execute(query)
-
-            # copy data
-            query = sql.SQL("COPY {} FROM STDIN WITH CSV HEADER").format(tmp_table)
-            with open(abs_path, 'r', encoding='utf-8') as f:
-                cur.copy_expert(query, f)
-
-            # audit - check if data already exists for this snapshot_id
-            query = sql.SQL("SELECT COUNT(*) FROM {} WHERE _snapshot_id = %s;").format(target_table)
-            cur.execute(query, (snapshot_id,)) 
-            existing_rows = cur.fetchone()[0]
-            if existing_rows > 0:
+            # metadata columns default to these settings, they are reset when the transaction ends.
+            # synchronous_commit off (SET LOCAL equivalent) skips waiting on the WAL flush at commit:
+            # a crash can only lose whole recently committed files, and since their file_manifest rows are
+            # lost with them, the next run simply reloads those files.
+            cur.execute(
+                """
+                SELECT set_config('bronze.snapshot_id', %s, true),
+                       set_config('bronze.run_id', %s, true),
+                       set_config('bronze.source_file', %s, true),
+                       set_config('synchronous_commit', 'off', true)
+                """, (snapshot_id, run_id, source_file))
+
+            # identifiers are composed safely once per table and reused across loads
+            queries = _compile_queries(table_name, tuple(_csv_columns(cur, table_name)))
+
+            # idempocency - clear existing data for this snapshot_id.
+            # when the table holds no other snapshot, TRUNCATE empties it without leaving dead tuples behind.
+            # a single pass counts both the rows of this snapshot and those of any other one.
+            cur.execute(queries['snapshot_counts'], (snapshot_id, snapshot_id))
+            deleted_rows, other_rows = cur.fetchone()
+            if deleted_rows > 0:
+                if other_rows > 0:
+                    cur.execute(queries['delete'], (snapshot_id,))
+                    deleted_rows = cur.rowcount
+                else:
+                    cur.execute(queries['truncate'])
+
+            # audit - the delete's row count tells us if data already existed for this snapshot_id
+            if deleted_rows > 0:
                 logger.warning("replacing_existing_data", extra={
                     "table": table_name,
                     "snapshot_id": snapshot_id,
-                    "rows_replaced": existing_rows,
+                    "rows_replaced": deleted_rows,
                 })
 
-            # idempocency - clear existing data for this snapshot_id
-            query = sql.SQL("DELETE FROM {} WHERE _snapshot_id = %s;").format(target_table)
-            cur.execute(query, (snapshot_id,))
-            deleted_rows = cur.rowcount
-
-            # insert into target table
-            query = sql.SQL("""
-            INSERT INTO {} 
-            SELECT *, %s, %s, NOW(), %s
-            FROM {};
-            """).format(target_table, tmp_table)
-            cur.execute(query, (snapshot_id, run_id, source_file))
-
-            # get row count
-            query = sql.SQL("SELECT COUNT(*) FROM {};").format(tmp_table)
-            cur.execute(query)
-            row_count = cur.fetchone()[0]
-
-            conn.commit()
+            # copy data - the file is opened in binary mode, so the raw bytes go to libpq without a python-side decode/re-encode.
+            # gzipped files are decompressed on the fly, the server still receives plain CSV
+            opener = gzip.open if abs_path.endswith('.gz') else open
+            with opener(abs_path, 'rb') as f:
+                cur.copy_expert(queries['copy'], f, size=COPY_CHUNK_SIZE)
+            row_count = cur.rowcount
+
+            if commit:
+                conn.commit()
             duration = time.time() - start_time
             logger.info("csv_load_success", extra={
                 "table": table_name,
@@ -381,4 +509,6 @@ def load_csv_via_temp_table(conn: extensions.connection, csv_path: str, table_na
             "error": str(e)
         }, exc_info=True)
         conn.rollback()
+        if isinstance(e, LoadError):
+            raise
         raise LoadError(table_name, str(e)) from e
\ No newline at end of file
@@ -121,12 +121,11 @@ def load(snapshot_id: str = None, run_id: str = None, resume: bool = False) -> S
     """
 
     if snapshot_id is None:
-        from bronze.config import latest_manifest_path
-        import json
+        from bronze.config import latest_manifest_path, read_manifest
         path = latest_manifest_path()
         if path is None:
             raise FileNotFoundError('No manifest found, try running bronze pipeline first.')
-        manifest = json.loads(path.read_text())
+        manifest = read_manifest(path)
         snapshot_id = manifest['snapshot_id']
 
     run_id = run_id or str(uuid.uuid4())
@@ -10,11 +10,15 @@ FIXTURE TYPES:
   4. load_conn         — Patches load_silver's connection and health_check so we can
                          call load() against the test DB with commits disabled.
   5. mock_resolve      — Replaces resolve_effective_snapshot with a simple mapping.
+  6. bronze_load       — Writes a manifest and raw files to tmp_path and stubs load_bronze's
+                         connection, run bookkeeping and notify so load() runs without a DB.
 """
 
 import os
+import json
 import uuid
 from contextlib import contextmanager
+from types import SimpleNamespace
 
 import pytest
 from unittest.mock import MagicMock
@@ -261,6 +265,63 @@ def load_conn(txn, monkeypatch):
     return proxy
 
 
+@pytest.fixture
+def bronze_load(tmp_path, monkeypatch, mock_conn):
+    """Stubs everything around bronze load() so a test only overrides the step it is about.
+
+    WHAT THIS DOES:
+      1. Writes a manifest for 'snap1' with the given file entries to tmp_path, plus a raw
+         file per entry, and points manifest_path / raw_dir at tmp_path.
+      2. Replaces get_db_connection with a context manager that yields one mock_conn,
+         whose fetchall returns latest_hashes (the rows _latest_file_hashes reads).
+      3. Replaces health_check, the metadata migration, fetch_bronze_schema and notify.
+      4. Defaults _load_file to a successful load of 5 rows and run_snapshot_quality_checks
+         to no results, tests monkeypatch these afterwards to change the outcome.
+      5. Records _record_failed_file_loads and _complete_run in order in `calls`:
+         ('failures', sorted failures) and ('run', status, error_message).
+
+    USAGE:
+      env = bronze_load([{'filename': 'olist_orders_dataset.csv', 'hash': 'new', 'size': 1}])
+      monkeypatch.setattr(load_bronze, '_load_file', _fail)
+      load_bronze.load(snapshot_id='snap1')
+      assert env.calls[-1][:2] == ('run', 'failed')
+    """
+    from bronze import load_bronze
+
+    def _setup(files, latest_hashes=()):
+        manifest = {'snapshot_id': 'snap1', 'files': files}
+        (tmp_path / 'snap1.json').write_text(json.dumps(manifest))
+        for entry in files:
+            (tmp_path / entry['filename']).write_text("a\n")
+
+        conn, _ = mock_conn(fetchall=list(latest_hashes))
+
+        @contextmanager
+        def _mock_get_db():
+            yield conn
+
+        env = SimpleNamespace(conn=conn, register=MagicMock(), notify=MagicMock(), calls=[])
+
+        monkeypatch.setattr(load_bronze, 'manifest_path', lambda sid: tmp_path / f"{sid}.json")
+        monkeypatch.setattr(load_bronze, 'raw_dir', lambda sid: tmp_path)
+        monkeypatch.setattr(load_bronze, 'health_check', lambda: {'status': 'healthy'})
+        monkeypatch.setattr(load_bronze, 'get_db_connection', _mock_get_db)
+        monkeypatch.setattr(load_bronze, 'migrate_bronze_metadata_defaults', lambda c: [])
+        monkeypatch.setattr(load_bronze, '_register_run', env.register)
+        monkeypatch.setattr(load_bronze, 'fetch_bronze_schema', lambda c: {})
+        monkeypatch.setattr(load_bronze, '_load_file', lambda *args: MagicMock(rows_inserted=5))
+        monkeypatch.setattr(load_bronze, 'run_snapshot_quality_checks', lambda *args: [])
+        monkeypatch.setattr(load_bronze, 'persist_quality_results', MagicMock())
+        monkeypatch.setattr(load_bronze, '_record_failed_file_loads',
+                            lambda c, r, f: env.calls.append(('failures', sorted(f))))
+        monkeypatch.setattr(load_bronze, '_complete_run',
+                            lambda c, r, status, msg=None: env.calls.append(('run', status, msg)))
+        monkeypatch.setattr(load_bronze, 'notify', env.notify)
+        return env
+
+    return _setup
+
+
 @pytest.fixture
 def mock_resolve(monkeypatch):
     """Monkeypatches resolve_effective_snapshot to map all bronze tables to the given snapshot.
@@ -0,0 +1,65 @@
+"""
+Tests for bronze/config.py: the latest manifest lookup that load and silver
+use when no snapshot_id is given.
+
+WHAT THESE TESTS COVER:
+  latest_manifest_path — Newest manifest by mtime, cached per manifest-directory mtime.
+  write_manifest       — Drops the cached lookup, since overwriting a file leaves the dir mtime alone.
+  clear_manifest_cache — Public reset of the cached lookup.
+
+TECHNIQUE:
+  MANIFEST_DIR is monkeypatched to a tmp_path folder; the cache is cleared
+  before and after every test so tests can't see each other's lookups.
+"""
+import os
+import pytest
+from bronze import config
+from bronze.config import latest_manifest_path, write_manifest, clear_manifest_cache
+
+
+@pytest.fixture
+def manifest_dir(tmp_path, monkeypatch):
+    d = tmp_path / "manifest"
+    d.mkdir()
+    monkeypatch.setattr(config, "MANIFEST_DIR", d)
+    clear_manifest_cache()
+    yield d
+    clear_manifest_cache()
+
+
+class TestLatestManifestPath:
+    """
+    WHAT: Verify the newest manifest is returned and the directory scan is cached.
+
+    WHY:  A stale cache would make load pick an old snapshot.
+
+    TECHNIQUE: Set explicit mtimes with os.utime and inspect the lru_cache counters.
+    """
+    def _write(self, d, name, mtime):
+        path = d / name
+        path.write_text("{}")
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_returns_none_without_directory(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(config, "MANIFEST_DIR", tmp_path / "missing")
+        assert latest_manifest_path() is None
+
+    def test_returns_newest_manifest(self, manifest_dir):
+        self._write(manifest_dir, "old.json", 1_000)
+        newest = self._write(manifest_dir, "new.json", 2_000)
+        (manifest_dir / "notes.txt").write_text("ignored")
+        assert latest_manifest_path() == newest.resolve()
+
+    def test_repeated_lookup_is_cached(self, manifest_dir):
+        self._write(manifest_dir, "a.json", 1_000)
+        latest_manifest_path()
+        latest_manifest_path()
+        info = config._latest_manifest_for.cache_info()
+        assert (info.misses, info.hits) == (1, 1)
+
+    def test_write_manifest_invalidates_cache(self, manifest_dir):
+        old = self._write(manifest_dir, "old.json", 1_000)
+        assert latest_manifest_path() == old.resolve()
+        path = write_manifest({"snapshot_id": "new", "files": []})
+        assert latest_manifest_path() == path.resolve()
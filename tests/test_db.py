@@ -1,31 +1,37 @@
 import os
+import re
 import pytest
+from pathlib import Path
 from unittest.mock import MagicMock
 
-from db import _validate_config, ConfigError, load_csv_via_temp_table, ALLOWED_TABLES
+import db
+from db import _validate_config, ConfigError, load_csv_into_bronze, ALLOWED_TABLES
 
 """
 Tests for db.py
 - Security validations
 - config fail fast behavior
+- direct COPY load into the bronze table
+- idle-only connection pings
+- connection acquire retries
 """
 
 ### table allowlist
 
 class TestTableAllowed: 
     """
-    load_csv_via_temp_table must reject any table not in ALLOWED_TABLES.
+    load_csv_into_bronze must reject any table not in ALLOWED_TABLES.
     """
 
     def test_rejects_sql_injection_attempt(self):
         conn = MagicMock()
         with pytest.raises(ValueError, match = 'Security Error'):
-            load_csv_via_temp_table(conn, 'fake.csv', 'orders; DROP TABLE users;--', 'snap', 'run', 'f.csv')
+            load_csv_into_bronze(conn, 'fake.csv', 'orders; DROP TABLE users;--', 'snap', 'run', 'f.csv')
 
     def test_rejects_unknown_table(self):
         conn = MagicMock()
         with pytest.raises(ValueError, match = 'Security Error'): 
-            load_csv_via_temp_table(conn, 'fake.csv', 'not_a_real_table', 'snap', 'run', 'f.csv')
+            load_csv_into_bronze(conn, 'fake.csv', 'not_a_real_table', 'snap', 'run', 'f.csv')
 
     def test_accepts_every_allowed_table(self, tmp_path):
         """ Sanity check: 
@@ -34,25 +40,254 @@ class TestTableAllowed:
         conn = MagicMock()
         for table in ALLOWED_TABLES:
             with pytest.raises((ValueError, FileNotFoundError)):
-                load_csv_via_temp_table(conn, 'Data/fake.csv', table, 'snap', 'run', 'f.csv')
+                load_csv_into_bronze(conn, 'Data/fake.csv', table, 'snap', 'run', 'f.csv')
 
 
 ### path traversal checks
 
 class TestPathTraversal:
     """
-    load_csv_via_temp_table must reject paths outside the Data/ directory.
+    load_csv_into_bronze must reject paths outside the Data/ directory.
     """
     
     def test_rejects_abolute_system_paths(self):
         conn = MagicMock()
         with pytest.raises(ValueError, match = 'Invalid CSV path'):
-            load_csv_via_temp_table(conn, '/etc/passwd', 'orders', 'snap', 'run', 'f.csv')
+            load_csv_into_bronze(conn, '/etc/passwd', 'orders', 'snap', 'run', 'f.csv')
 
     def test_rejects_relative_traversal(self):
         conn = MagicMock()
         with pytest.raises(ValueError, match = 'Invalid CSV path'):
-            load_csv_via_temp_table(conn, 'Data/../../../etc/passwd', 'orders', 'snap', 'run', 'f.csv')
+            load_csv_into_bronze(conn, 'Data/../../../etc/passwd', 'orders', 'snap', 'run', 'f.csv')
+
+
+### direct copy load
+
+class TestDirectCopyLoad:
+    """
+    load_csv_into_bronze must COPY the CSV columns straight into the bronze table,
+    with the metadata columns filled from transaction-local settings.
+    """
+
+    def _setup(self, tmp_path, monkeypatch, mock_conn):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(db, '_CSV_COLUMNS', {})
+        (tmp_path / 'Data').mkdir()
+        csv_file = tmp_path / 'Data' / 'orders.csv'
+        csv_file.write_text('order_id,order_status\n1,delivered\n2,shipped\n', encoding='utf-8')
+        columns = [('order_id', None), ('order_status', None)] + list(db.METADATA_DEFAULTS.items())
+        conn, cur = mock_conn(fetchone=(0, 0), fetchall=columns)
+        cur.rowcount = 2
+        return conn, cur, str(csv_file)
+
+    def test_row_count_comes_from_copy(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        result = load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        assert result.rows_inserted == 2
+        cur.copy_expert.assert_called_once()
+        conn.commit.assert_called_once()
+
+    def test_copy_reads_large_chunks(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        assert cur.copy_expert.call_args.kwargs['size'] == db.COPY_CHUNK_SIZE
+
+    def test_streams_gzipped_csv_decompressed(self, tmp_path, monkeypatch, mock_conn):
+        import gzip
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        gz_path = path + '.gz'
+        with open(path, 'rb') as src, gzip.open(gz_path, 'wb') as dst:
+            dst.write(src.read())
+
+        copied = []
+        cur.copy_expert.side_effect = lambda query, f, *args, **kwargs: copied.append(f.read())
+        load_csv_into_bronze(conn, gz_path, 'orders', 'snap', 'run', 'orders.csv')
+        assert copied == [open(path, 'rb').read()]
+
+    def test_sets_metadata_settings_first(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        query, params = cur.execute.call_args_list[0].args
+        assert 'set_config' in query
+        assert params == ('snap', 'run', 'orders.csv')
+
+    def test_disables_synchronous_commit_for_the_transaction(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        query, _ = cur.execute.call_args_list[0].args
+        assert "set_config('synchronous_commit', 'off', true)" in query
+
+    def test_truncates_when_only_this_snapshot_is_stored(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        cur.fetchone.return_value = (5, 0)  # 5 rows of this snapshot, no other snapshot
+        result = load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        queries = db._compile_queries('orders', ('order_id', 'order_status'))
+        executed = [c.args[0] for c in cur.execute.call_args_list]
+        assert queries['truncate'] in executed
+        assert queries['delete'] not in executed
+        assert result.rows_deleted == 5
+
+    def test_deletes_when_other_snapshots_are_stored(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        cur.fetchone.return_value = (5, 3)  # 5 rows of this snapshot, 3 of another one
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        queries = db._compile_queries('orders', ('order_id', 'order_status'))
+        executed = [c.args[0] for c in cur.execute.call_args_list]
+        assert queries['delete'] in executed
+        assert queries['truncate'] not in executed
+
+    def test_existing_rows_are_counted_in_one_query(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        cur.fetchone.return_value = (0, 3)  # nothing of this snapshot to clear
+        result = load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        queries = db._compile_queries('orders', ('order_id', 'order_status'))
+        executed = [c.args[0] for c in cur.execute.call_args_list]
+        assert cur.fetchone.call_count == 1
+        assert queries['delete'] not in executed
+        assert queries['truncate'] not in executed
+        assert result.rows_deleted == 0
+
+    def test_csv_columns_cached_per_table(self, tmp_path, monkeypatch, mock_conn):
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        assert cur.fetchall.call_count == 1
+        assert db._CSV_COLUMNS['orders'] == ['order_id', 'order_status']
+
+    def test_metadata_column_without_default_fails_the_load(self, tmp_path, monkeypatch, mock_conn):
+        # a database created before the defaults existed would COPY every row with NULL metadata
+        conn, cur, path = self._setup(tmp_path, monkeypatch, mock_conn)
+        cur.fetchall.return_value = [('order_id', None), ('_snapshot_id', None), ('_run_id', None),
+                                     ('_inserted_at', 'now()'), ('_source_file', None)]
+        with pytest.raises(db.LoadError, match=r"\['_snapshot_id', '_run_id', '_source_file'\]"):
+            load_csv_into_bronze(conn, path, 'orders', 'snap', 'run', 'orders.csv')
+        cur.copy_expert.assert_not_called()
+        conn.rollback.assert_called_once()
+        assert 'orders' not in db._CSV_COLUMNS
+
+
+### metadata default migration
+
+class TestMetadataDefaultsMigration:
+    """
+    migrate_bronze_metadata_defaults must add the missing defaults to an existing
+    database, and do nothing when they are all in place.
+    """
+
+    def test_alters_only_missing_defaults(self, mock_conn):
+        conn, cur = mock_conn(fetchall=[('orders', '_run_id'), ('orders', '_snapshot_id'), ('not_bronze', '_run_id')])
+        migrated = db.migrate_bronze_metadata_defaults(conn)
+        assert migrated == ['orders._run_id', 'orders._snapshot_id']
+        # one lookup + one ALTER per missing column
+        assert cur.execute.call_count == 3
+        conn.commit.assert_called_once()
+
+    def test_noop_when_defaults_exist(self, mock_conn):
+        conn, cur = mock_conn(fetchall=[])
+        assert db.migrate_bronze_metadata_defaults(conn) == []
+        cur.execute.assert_called_once()
+
+    def test_defaults_match_the_initdb_ddl(self):
+        ddl = (Path(__file__).parents[1] / 'docker' / 'initdb' / '02_bronze_ddl.sql').read_text()
+        for col, expr in db.METADATA_DEFAULTS.items():
+            found = set(re.findall(rf"{col} \w+ DEFAULT (.+?),?\r?$", ddl, re.MULTILINE))
+            assert found == {expr}, col
+
+
+### connection pings
+
+class TestIdlePing:
+    """
+    get_db_connection must only ping connections that sat idle in the pool
+    for longer than IDLE_PING_SEC, and discard connections that failed.
+    """
+
+    def _setup(self, monkeypatch):
+        conn = MagicMock(closed=0)
+        fake_pool = MagicMock()
+        fake_pool.getconn.return_value = conn
+        ping = MagicMock(return_value=True)
+        monkeypatch.setattr(db, '_DB_POOL', fake_pool)
+        monkeypatch.setattr(db, '_RETURNED_AT', {})
+        monkeypatch.setattr(db, '_is_alive', ping)
+        return conn, fake_pool, ping
+
+    def test_no_ping_on_return_or_fresh_checkout(self, monkeypatch):
+        conn, fake_pool, ping = self._setup(monkeypatch)
+        with db.get_db_connection():
+            pass
+        with db.get_db_connection():
+            pass
+        ping.assert_not_called()
+        fake_pool.putconn.assert_called_with(conn)
+
+    def test_pings_after_idle_timeout(self, monkeypatch):
+        conn, _, ping = self._setup(monkeypatch)
+        db._RETURNED_AT[id(conn)] = 0.0  # returned "long ago"
+        with db.get_db_connection():
+            pass
+        ping.assert_called_once_with(conn)
+
+    def test_replacement_for_stale_connection_is_checked_too(self, monkeypatch):
+        stale, also_stale, fresh = MagicMock(closed=0), MagicMock(closed=0), MagicMock(closed=0)
+        fake_pool = MagicMock()
+        fake_pool.getconn.side_effect = [stale, also_stale, fresh]
+        ping = MagicMock(return_value=False)
+        monkeypatch.setattr(db, '_DB_POOL', fake_pool)
+        monkeypatch.setattr(db, '_RETURNED_AT', {id(stale): 0.0, id(also_stale): 0.0})
+        monkeypatch.setattr(db, '_is_alive', ping)
+
+        with db.get_db_connection() as conn:
+            assert conn is fresh
+        assert ping.call_count == 2
+        fake_pool.putconn.assert_any_call(stale, close=True)
+        fake_pool.putconn.assert_any_call(also_stale, close=True)
+        assert list(db._RETURNED_AT) == [id(fresh)]
+
+    def test_forgets_connection_the_pool_closed_on_return(self, monkeypatch):
+        conn, fake_pool, _ = self._setup(monkeypatch)
+        fake_pool.putconn.side_effect = lambda c: setattr(c, 'closed', 1)  # pool above minconn
+        with db.get_db_connection():
+            pass
+        assert db._RETURNED_AT == {}
+
+    def test_discards_connection_after_connection_error(self, monkeypatch):
+        conn, fake_pool, _ = self._setup(monkeypatch)
+        with pytest.raises(db.DbConnectionError):
+            with db.get_db_connection():
+                raise db.OperationalError('server closed the connection')
+        fake_pool.putconn.assert_called_once_with(conn, close=True)
+
+
+### acquire retries
+
+class TestAcquireRetry:
+    """
+    _acquire_connection must retry transient pool errors with backoff
+    and give up after ACQUIRE_ATTEMPTS.
+    """
+
+    def test_retries_then_succeeds(self, monkeypatch):
+        conn = MagicMock()
+        fake_pool = MagicMock()
+        fake_pool.getconn.side_effect = [db.OperationalError('boom'), conn]
+        sleeps = []
+        monkeypatch.setattr(db, '_DB_POOL', fake_pool)
+        monkeypatch.setattr(db.time, 'sleep', sleeps.append)
+
+        assert db._acquire_connection() is conn
+        assert len(sleeps) == 1
+        assert 0.5 <= sleeps[0] <= 1.5
+
+    def test_gives_up_after_max_attempts(self, monkeypatch):
+        fake_pool = MagicMock()
+        fake_pool.getconn.side_effect = db.OperationalError('boom')
+        monkeypatch.setattr(db, '_DB_POOL', fake_pool)
+        monkeypatch.setattr(db.time, 'sleep', lambda _: None)
+
+        with pytest.raises(db.OperationalError):
+            db._acquire_connection()
+        assert fake_pool.getconn.call_count == db.ACQUIRE_ATTEMPTS
 
 
 ### config fail fast behavior
@@ -88,6 +323,16 @@ class TestConfigValidation:
         assert config['database'] == 'test'
         assert config['connect_timeout'] == 10
 
+    def test_enables_tcp_keepalives(self, monkeypatch):
+        for var in self.REQUIRED_VARS:
+            monkeypatch.setenv(var, 'test')
+        monkeypatch.setenv('DB_KEEPALIVES_IDLE', '60')
+
+        config = _validate_config()
+        assert config['keepalives'] == 1
+        assert config['keepalives_idle'] == 60
+        assert config['keepalives_interval'] == 10
+
     def test_custom_connect_timeout(self, monkeypatch):
         for var in self.REQUIRED_VARS:
             monkeypatch.setenv(var, 'test')
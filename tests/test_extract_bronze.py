@@ -1,13 +1,16 @@
 """
-Tests for extract_bronze.py: compute_hash and _count_csv_rows,
+Tests for extract_bronze.py: compute_hash and _extract_and_hash,
 the foundations of snapshot IDs and manifest accuracy.
 
 WHAT THESE TESTS COVER:
   compute_hash  — SHA-256 hashing of raw source files.  The hash is used as
                   the snapshot ID, so correctness here guarantees idempotency:
                   same file → same snapshot → no duplicate loads.
-  _count_csv_rows — Counts data rows (excluding header).  The count goes into
-                    the file manifest and later feeds the row_count quality check.
+  _extract_and_hash — Writes a zip member to disk, hashes it and counts its data
+                      rows (excluding header) in one pass.  The hash goes into the
+                      file manifest for change detection, the count later feeds the
+                      row_count quality check.
+  _reusable_file_entries — Reuses manifest entries whose file size and mtime_ns are unchanged.
 
 WHY UNIT TESTS ARE ENOUGH:
   Both functions are pure (file in → value out) with no DB interaction.
@@ -15,8 +18,12 @@ WHY UNIT TESTS ARE ENOUGH:
   so no mocking or fixtures from conftest.py are needed.
 """
 
+import os
+import json
 import hashlib
-from bronze.extract_bronze import compute_hash, _count_csv_rows
+import zipfile
+from bronze import extract_bronze
+from bronze.extract_bronze import compute_hash, _extract_and_hash, _reusable_file_entries
 
 
 class TestComputeHash:
@@ -50,27 +57,98 @@ class TestComputeHash:
         assert compute_hash(a) == compute_hash(b)
 
 
+def _extract(tmp_path, payload: bytes) -> tuple[str, int]:
+    """ zip payload as data.csv and run it through _extract_and_hash. """
+    zip_path = tmp_path / "data.zip"
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("data.csv", payload)
+    with zipfile.ZipFile(zip_path) as zf:
+        return _extract_and_hash(zf, zf.getinfo("data.csv"), tmp_path / "data.csv")
+
+
 class TestCountCsvRows:
     """
-    WHAT: Verify _count_csv_rows counts data rows and excludes the header.
+    WHAT: Verify _extract_and_hash counts data rows and excludes the header.
     
     WHY:  The count is stored in the file manifest and later compared by
           check_row_count (quality check).  Off-by-one here means false DQ failures.
     
-    TECHNIQUE: Write CSV strings to tmp_path files with known row counts.
+    TECHNIQUE: Zip CSV strings in tmp_path with known row counts and extract them.
     """
     def test_counts_data_rows_only(self, tmp_path):
-        f = tmp_path / "data.csv"
-        f.write_text("col1,col2\na,b\nc,d\ne,f\n", encoding="utf-8")
-        assert _count_csv_rows(f) == 3
+        _, rows = _extract(tmp_path, b"col1,col2\na,b\nc,d\ne,f\n")
+        assert rows == 3
 
     def test_header_only_returns_zero(self, tmp_path):
-        f = tmp_path / "empty.csv"
-        f.write_text("col1,col2\n", encoding="utf-8")
-        assert _count_csv_rows(f) == 0
+        _, rows = _extract(tmp_path, b"col1,col2\n")
+        assert rows == 0
+
+    def test_ignores_newlines_inside_quoted_fields(self, tmp_path):
+        _, rows = _extract(tmp_path, b'id,comment\n1,"line one\nline two"\n2,"say ""hi""\r\nbye"\n3,plain\n')
+        assert rows == 3
+
+    def test_quoted_field_spanning_chunks(self, tmp_path):
+        # the quoted field is longer than the 1 MiB read chunk, so the quote state must carry over
+        comment = b'"' + b"line\n" * 300_000 + b'"'
+        _, rows = _extract(tmp_path, b"id,comment\n1," + comment + b"\n2,plain\n")
+        assert rows == 2
 
     def test_handles_large_row_count(self, tmp_path):
-        f = tmp_path / "big.csv"
         lines = ["id,value"] + [f"{i},data" for i in range(10_000)]
-        f.write_text("\n".join(lines), encoding="utf-8")
-        assert _count_csv_rows(f) == 10_000
\ No newline at end of file
+        _, rows = _extract(tmp_path, "\n".join(lines).encode("utf-8"))
+        assert rows == 10_000
+
+class TestExtractAndHash:
+    """
+    WHAT: Verify _extract_and_hash writes the member unchanged and returns its hash.
+
+    WHY:  The manifest hash is no longer computed from the file on disk, so the
+          single-pass hash must match what compute_hash would give for the extracted file.
+
+    TECHNIQUE: Build a small zip in tmp_path, extract one member, compare bytes and hashes.
+    """
+    def test_hash_matches_extracted_file(self, tmp_path):
+        payload = b"col1,col2\n" + b"a,b\n" * 50_000
+        digest, rows = _extract(tmp_path, payload)
+
+        dest = tmp_path / "data.csv"
+        assert dest.read_bytes() == payload
+        assert digest == hashlib.sha256(payload).hexdigest()
+        assert digest == compute_hash(dest)
+        assert rows == 50_000
+
+
+class TestReusableFileEntries:
+    """
+    WHAT: Verify _reusable_file_entries only reuses entries whose file is untouched on disk.
+
+    WHY:  A reused entry skips hashing and row counting, so a modified file must never match.
+
+    TECHNIQUE: Write a manifest into tmp_path (MANIFEST_DIR monkeypatched) with the
+    file's real size and mtime_ns, then touch or rewrite the file.
+    """
+    def _setup(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(extract_bronze, 'manifest_path', lambda sid: tmp_path / f"{sid}.json")
+        snapshot_dir = tmp_path / "snap"
+        snapshot_dir.mkdir()
+        f = snapshot_dir / "data.csv"
+        f.write_text("col\n1\n")
+        st = f.stat()
+        entry = {'filename': 'data.csv', 'hash': 'abc', 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'row_count': 1}
+        (tmp_path / "snap1.json").write_text(json.dumps({'snapshot_id': 'snap1', 'files': [entry]}))
+        return snapshot_dir, f, entry
+
+    def test_reuses_untouched_file(self, tmp_path, monkeypatch):
+        snapshot_dir, _, entry = self._setup(tmp_path, monkeypatch)
+        assert _reusable_file_entries('snap1', snapshot_dir) == {'data.csv': entry}
+
+    def test_skips_file_with_new_mtime(self, tmp_path, monkeypatch):
+        snapshot_dir, f, entry = self._setup(tmp_path, monkeypatch)
+        os.utime(f, ns=(entry['mtime_ns'] + 10**9, entry['mtime_ns'] + 10**9))
+        assert _reusable_file_entries('snap1', snapshot_dir) == {}
+
+    def test_skips_missing_file_and_manifest(self, tmp_path, monkeypatch):
+        snapshot_dir, f, _ = self._setup(tmp_path, monkeypatch)
+        f.unlink()
+        assert _reusable_file_entries('snap1', snapshot_dir) == {}
+        assert _reusable_file_entries('other', snapshot_dir) == {}
@@ -5,6 +5,13 @@ whether a file gets re-loaded (idempotency gate).
 WHAT THIS TESTS:
   _file_changed compares a file's current SHA-256 hash against the last hash
   stored in ingestion.file_manifest.  It returns True (reload) or False (skip).
+  _latest_file_hashes fetches those last hashes for every file in one query.
+  _raw_file_paths finds every raw csv (or its .gz copy) in one directory scan.
+  load short-circuits without registering a run when no file changed.
+  _record_file_load writes the file outcome in one upsert.
+  _record_failed_file_loads / load record every failed file on the main connection in one batch.
+  load_files fails the run when the extract feeding it failed.
+  load runs the quality checks once, after all files are loaded, for every loaded table.
 
 WHY THIS MATTERS:
   This is the idempotency gate for the entire bronze layer.  If it returns True
@@ -12,13 +19,18 @@ WHY THIS MATTERS:
   file DID change, we miss new data silently.
 
 TECHNIQUE:
-  Uses mock_conn from conftest.py to simulate fetchone results:
-    - None          -> file never loaded before  -> True
-    - ("old_hash",) -> hash differs              -> True
-    - ("same",)     -> hash matches              -> False
-  No real DB needed; the function only does one SELECT.
+  _file_changed is pure over the {filename: hash} lookup:
+    - missing key   -> file never loaded before  -> True
+    - "old_hash"    -> hash differs              -> True
+    - "same"        -> hash matches              -> False
+  mock_conn from conftest.py simulates the fetchall of _latest_file_hashes.
+  No real DB needed.
 """
-from bronze.load_bronze import _file_changed
+import pytest
+from unittest.mock import patch
+from bronze import load_bronze
+from bronze.load_bronze import _file_changed, _latest_file_hashes, _max_load_workers, _raw_file_paths, _record_file_load, _record_failed_file_loads
+from bronze.config import FILE_TO_TABLE
 
 
 class TestFileChanged:
@@ -27,25 +39,234 @@ class TestFileChanged:
     
     WHY:  Each branch maps to a distinct pipeline behavior (first load, reload, skip).
     
-    TECHNIQUE: mock_conn(fetchone=...) controls the single SELECT result.
+    TECHNIQUE: the latest_hashes dict stands in for the rows of ingestion.file_manifest.
     """
-    def test_true_when_never_loaded_before(self, mock_conn):
+    def test_true_when_never_loaded_before(self):
         """
         First load: no row in file_manifest, so file is 'changed'.
         """
-        conn, _ = mock_conn(fetchone=None)
-        assert _file_changed(conn, "orders.csv", "abc123") is True
+        assert _file_changed({}, "orders.csv", "abc123") is True
 
-    def test_true_when_hash_differs(self, mock_conn):
+    def test_true_when_hash_differs(self):
         """
         Source file changed since last load.
         """
-        conn, _ = mock_conn(fetchone=("old_hash_value",))
-        assert _file_changed(conn, "orders.csv", "new_hash_value") is True
+        assert _file_changed({"orders.csv": "old_hash_value"}, "orders.csv", "new_hash_value") is True
 
-    def test_false_when_hash_matches(self, mock_conn):
+    def test_false_when_hash_matches(self):
         """
         File unchanged — skip loading.
         """
-        conn, _ = mock_conn(fetchone=("same_hash",))
-        assert _file_changed(conn, "orders.csv", "same_hash") is False
\ No newline at end of file
+        assert _file_changed({"orders.csv": "same_hash"}, "orders.csv", "same_hash") is False
+
+class TestLatestFileHashes:
+    """
+    WHAT: Verify _latest_file_hashes turns the DISTINCT ON rows into a lookup.
+
+    WHY:  One query replaces a SELECT per file, the lookup must keep every file.
+
+    TECHNIQUE: mock_conn(fetchall=...) returns (filename, file_hash) rows.
+    """
+    def test_builds_lookup_in_one_query(self, mock_conn):
+        conn, cursor = mock_conn(fetchall=[("orders.csv", "h1"), ("sellers.csv", "h2")])
+        assert _latest_file_hashes(conn) == {"orders.csv": "h1", "sellers.csv": "h2"}
+        cursor.execute.assert_called_once()
+
+    def test_empty_manifest(self, mock_conn):
+        conn, _ = mock_conn(fetchall=[])
+        assert _latest_file_hashes(conn) == {}
+
+class TestMaxLoadWorkers:
+    """
+    WHAT: Verify the loader thread pool is sized from DB_POOL_MAX.
+
+    WHY:  Every worker holds its own pooled connection.  Over-sizing the pool of
+          workers would exhaust the connection pool and fail the file loads.
+
+    TECHNIQUE: monkeypatch DB_POOL_MAX and compare against FILE_TO_TABLE size.
+    """
+    def test_capped_by_file_count(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_MAX", "100")
+        monkeypatch.setenv("BRONZE_LOAD_WORKERS", "100")
+        assert _max_load_workers() == len(FILE_TO_TABLE)
+
+    def test_leaves_pool_headroom(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_MAX", "5")
+        monkeypatch.setenv("BRONZE_LOAD_WORKERS", "100")
+        assert _max_load_workers() == 3
+
+    def test_defaults_to_cpu_count(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_MAX", "100")
+        monkeypatch.delenv("BRONZE_LOAD_WORKERS", raising=False)
+        monkeypatch.setattr("os.cpu_count", lambda: 2)
+        assert _max_load_workers() == 2
+
+    def test_env_override(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_MAX", "100")
+        monkeypatch.setenv("BRONZE_LOAD_WORKERS", "4")
+        assert _max_load_workers() == 4
+
+    def test_never_below_one(self, monkeypatch):
+        monkeypatch.setenv("DB_POOL_MAX", "1")
+        assert _max_load_workers() == 1
+
+class TestRawFilePaths:
+    """
+    WHAT: Verify _raw_file_paths maps contract files to what is on disk.
+
+    WHY:  A file missing from the map is reported as missing and never loaded.
+
+    TECHNIQUE: Create plain and gzipped files in tmp_path.
+    """
+    def test_prefers_plain_csv_and_falls_back_to_gz(self, tmp_path):
+        plain, gzipped = list(FILE_TO_TABLE)[:2]
+        (tmp_path / plain).write_text("a\n")
+        (tmp_path / f"{plain}.gz").write_bytes(b"")
+        (tmp_path / f"{gzipped}.gz").write_bytes(b"")
+        (tmp_path / "unrelated.csv").write_text("a\n")
+        assert _raw_file_paths(tmp_path) == {
+            plain: tmp_path / plain,
+            gzipped: tmp_path / f"{gzipped}.gz",
+        }
+
+    def test_missing_directory(self, tmp_path):
+        assert _raw_file_paths(tmp_path / "nope") == {}
+
+
+class TestNothingToDo:
+    """
+    WHAT: Verify load returns an empty summary without touching ingestion.runs when every hash matches.
+
+    WHY:  A no-op rerun should cost one query, not a run row and a status update.
+
+    TECHNIQUE: bronze_load from conftest.py serves the unchanged hash as the latest one,
+    the test fails if _register_run is reached.
+    """
+    def test_unchanged_files_skip_the_run(self, bronze_load):
+        file_name = next(iter(FILE_TO_TABLE))
+        env = bronze_load([{'filename': file_name, 'hash': 'h1', 'size': 2, 'row_count': 1}],
+                          latest_hashes=[(file_name, 'h1')])
+
+        summary = load_bronze.load(snapshot_id='snap1')
+        assert summary.tables_loaded == 0
+        assert summary.results == []
+        env.register.assert_not_called()
+
+
+class TestRecordFileLoad:
+    """
+    WHAT: Verify _record_file_load writes the outcome with a single statement and no commit.
+
+    WHY:  The file transaction commits once, a separate pending insert was never visible before that commit.
+
+    TECHNIQUE: mock_conn records the execute call and its parameters.
+    """
+    def test_single_upsert_without_commit(self, mock_conn):
+        conn, cursor = mock_conn()
+        _record_file_load(conn, 'run1', 'orders.csv', 'loaded', 10)
+        cursor.execute.assert_called_once()
+        assert cursor.execute.call_args.args[1] == ('run1', 'orders.csv', 'loaded', 10, None)
+        conn.commit.assert_not_called()
+
+
+class TestFailedFileLoads:
+    """
+    WHAT: Verify failed files are collected by load and written in one batch before the run completes.
+
+    WHY:  Workers no longer write their own failure rows, so load must not drop any.
+
+    TECHNIQUE: Stub _load_file to raise, bronze_load records what reaches _record_failed_file_loads.
+    """
+    def test_batch_insert_rows(self, mock_conn):
+        conn, _ = mock_conn()
+        with patch.object(load_bronze, 'execute_values') as ev:
+            _record_failed_file_loads(conn, 'run1', [('a.csv', 'boom'), ('b.csv', 'bang')])
+        ev.assert_called_once()
+        assert ev.call_args.args[2] == [('run1', 'a.csv', 'boom'), ('run1', 'b.csv', 'bang')]
+        conn.commit.assert_not_called()
+
+    def test_load_records_failures_before_completing_run(self, bronze_load, monkeypatch):
+        names = list(FILE_TO_TABLE)[:2]
+        env = bronze_load([{'filename': n, 'hash': 'new', 'size': 1} for n in names])
+
+        def _fail(run_id, snapshot_id, file_name, *args):
+            raise RuntimeError(f"{file_name} broke")
+
+        monkeypatch.setattr(load_bronze, '_load_file', _fail)
+
+        load_bronze.load(snapshot_id='snap1')
+        assert [c[:2] for c in env.calls] == [
+            ('failures', sorted((n, f"{n} broke") for n in names)),
+            ('run', 'failed'),
+        ]
+
+
+class TestExtractError:
+    """
+    WHAT: Verify load_files fails the run when the extract that fed it failed.
+
+    WHY:  The files streamed before the failure load fine, a 'success' run would hide a partial snapshot.
+
+    TECHNIQUE: bronze_load stubs the run bookkeeping, extract_error returns the extract failure.
+    """
+    def test_extract_error_fails_the_run(self, bronze_load, tmp_path):
+        file_name = next(iter(FILE_TO_TABLE))
+        entry = {'filename': file_name, 'hash': 'new', 'size': 1, 'row_count': 1}
+        env = bronze_load([entry])
+
+        load_bronze.load_files('snap1', [(file_name, tmp_path / file_name, entry)],
+                               extract_error=lambda: 'download broke')
+        assert env.calls == [('run', 'failed', 'extract failed: download broke')]
+        assert env.notify.call_args.args[0].status == 'failed'
+
+    def test_empty_extract_error_still_fails_the_run(self, bronze_load, tmp_path):
+        file_name = next(iter(FILE_TO_TABLE))
+        entry = {'filename': file_name, 'hash': 'new', 'size': 1, 'row_count': 1}
+        env = bronze_load([entry])
+
+        load_bronze.load_files('snap1', [(file_name, tmp_path / file_name, entry)], extract_error=lambda: '')
+        assert env.calls[-1][:2] == ('run', 'failed')
+
+
+class TestPostLoadQualityChecks:
+    """
+    WHAT: Verify load runs the quality checks once for all loaded tables after the COPYs.
+
+    WHY:  Workers only COPY, the checks must still cover every loaded table with its manifest row count.
+
+    TECHNIQUE: bronze_load stubs _load_file to succeed, capture the run_snapshot_quality_checks call.
+    """
+    def test_single_check_pass_after_loads(self, bronze_load, monkeypatch):
+        from bronze.quality_bronze import QualityResult
+        names = list(FILE_TO_TABLE)[:2]
+        env = bronze_load([
+            {'filename': n, 'hash': 'new', 'size': i + 1, 'row_count': 10 * (i + 1)} for i, n in enumerate(names)
+        ])
+
+        checks = []
+        failing = QualityResult(FILE_TO_TABLE[names[0]], 'row_count', False, 'error', {})
+
+        def _checks(c, expected_rows, snapshot_id, schema_cache):
+            checks.append(dict(expected_rows))
+            return [failing]
+
+        monkeypatch.setattr(load_bronze, 'run_snapshot_quality_checks', _checks)
+
+        summary = load_bronze.load(snapshot_id='snap1')
+        assert checks == [{FILE_TO_TABLE[names[0]]: 10, FILE_TO_TABLE[names[1]]: 20}]
+        assert [c[:2] for c in env.calls] == [('run', 'success_with_warnings')]
+        assert summary.tables_loaded == 2
+
+
+class TestManifestLookup:
+    """
+    WHAT: Verify load reports a missing manifest for an explicit snapshot_id.
+
+    WHY:  The lookup is a single read now, the error message must stay the same.
+
+    TECHNIQUE: Point manifest_path at an empty tmp_path.
+    """
+    def test_missing_manifest_raises(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(load_bronze, 'manifest_path', lambda sid: tmp_path / f"{sid}.json")
+        with pytest.raises(FileNotFoundError, match="No manifest found for snapshot: snap1"):
+            load_bronze.load(snapshot_id='snap1')
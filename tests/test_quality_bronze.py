@@ -7,11 +7,17 @@ WHAT THESE TESTS COVER:
                           plus the skip path when manifest has no count (severity=warning).
   check_not_empty       — Table must have >= 1 row for the snapshot.
   check_primary_key_nulls — NULL rate on each PK column must be 0.
-  check_schema          — PK + metadata columns must exist in information_schema.
+  check_schema          — PK + metadata columns must exist in information_schema,
+                          either queried per table or read from the fetch_bronze_schema cache.
+  run_quality_checks    — One UNION ALL of fused COUNT scans feeds not_empty, row_count
+                          and pk_nulls for every loaded table (run_snapshot_quality_checks).
+  persist_quality_results — All results go out in one execute_values batch.
   PrimaryKeyConsistency — Cross-check: every ALLOWED_TABLE has an entry in PRIMARY_KEYS.
 
 WHY UNIT TESTS ARE ENOUGH:
-  Every check does a single SELECT and returns a QualityResult dataclass.
+  Every check does a single SELECT and returns a QualityResult dataclass,
+  check_row_count / check_not_empty / check_primary_key_nulls all read the
+  same fused count query as run_snapshot_quality_checks.
   We control the SELECT output via mock_conn (fetchone / fetchall), so we can
   exercise pass, fail, and edge-case branches without a running database.
 
@@ -22,11 +28,19 @@ TECHNIQUE:
 """
 
 import pytest
+from unittest.mock import patch
+from psycopg2.extras import Json
+from bronze import quality_bronze
 from bronze.quality_bronze import (
     check_row_count,
     check_not_empty,
     check_primary_key_nulls,
     check_schema,
+    fetch_bronze_schema,
+    run_quality_checks,
+    run_snapshot_quality_checks,
+    persist_quality_results,
+    QualityResult,
     PRIMARY_KEYS,
 )
 from db import ALLOWED_TABLES
@@ -40,10 +54,10 @@ class TestCheckRowCount:
     WHY:  A mismatch means the COPY loaded fewer/more rows than the CSV had,
           which could indicate truncation, duplication, or a corrupt file.
     
-    TECHNIQUE: mock_conn(fetchone=...) sets the COUNT(*) result; expected_rows is passed directly.
+    TECHNIQUE: mock_conn(fetchall=[(table, count, pk nulls)]) sets the fused count row; expected_rows is passed directly.
     """
     def test_pass_when_counts_match(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(100,))
+        conn, _ = mock_conn(fetchall=[('orders', 100, [0])])
         result = check_row_count(conn, 'orders', 'snap1', expected_rows=100)
         assert result.passed is True
         assert result.details['expected'] == 100
@@ -51,15 +65,16 @@ class TestCheckRowCount:
         assert result.severity == 'error'
 
     def test_fail_when_counts_differ(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(99,))
+        conn, _ = mock_conn(fetchall=[('orders', 99, [0])])
         result = check_row_count(conn, 'orders', 'snap1', expected_rows=100)
         assert result.passed is False
         assert result.details['actual'] == 99
         assert result.severity == 'error'
 
     def test_skip_when_no_expected_rows(self, mock_conn):
-        conn, _ = mock_conn(fetchone=None)
+        conn, cursor = mock_conn()
         result = check_row_count(conn, 'orders', 'snap1', expected_rows=None)
+        cursor.execute.assert_not_called()
         assert result.passed is True
         assert result.details['skipped'] is True
         assert result.severity == 'warning'
@@ -74,17 +89,17 @@ class TestCheckNotEmpty:
     WHY:  An empty bronze table after loading means the source file was empty
           or the COPY silently failed.  This is a severity=error gate.
     
-    TECHNIQUE: mock_conn(fetchone=(N,)) where N is the row count.
+    TECHNIQUE: mock_conn(fetchall=[(table, N, pk nulls)]) where N is the row count.
     """
 
     def test_pass_when_rows_exist(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(42,))
+        conn, _ = mock_conn(fetchall=[('orders', 42, [0])])
         result = check_not_empty(conn, 'orders', 'snap1')
         assert result.passed is True
         assert result.severity == 'error'
 
     def test_fail_when_no_rows(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(0,))
+        conn, _ = mock_conn(fetchall=[('orders', 0, [0])])
         result = check_not_empty(conn, 'orders', 'snap1')
         assert result.passed is False
         assert result.details['row_count'] == 0
@@ -100,12 +115,12 @@ class TestCheckPrimaryKeyNulls:
     WHY:  PK NULLs break downstream JOINs in the silver layer and violate
           referential integrity assumptions.
     
-    TECHNIQUE: mock_conn(fetchone=(total, null_count)) simulates the
-    COUNT(*) / COUNT(*) FILTER (WHERE col IS NULL) query.
+    TECHNIQUE: mock_conn(fetchall=[(table, total, [null_count, ...])]) simulates the
+    fused COUNT(*) / COUNT(*) FILTER (WHERE col IS NULL) query, one null count per PK column.
     """
 
     def test_pass_when_no_nulls(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(100,0))
+        conn, _ = mock_conn(fetchall=[('orders', 100, [0])])
         result = check_primary_key_nulls(conn, 'orders', 'snap1')
         assert len(result) == 1
         assert result[0].passed is True
@@ -113,7 +128,7 @@ class TestCheckPrimaryKeyNulls:
         assert result[0].severity == 'error'
 
     def test_fail_when_nulls_exist(self, mock_conn):
-        conn, _ = mock_conn(fetchone=(200,10))
+        conn, _ = mock_conn(fetchall=[('orders', 200, [10])])
         result = check_primary_key_nulls(conn, 'orders', 'snap1')
         assert result[0].passed is False
         assert result[0].details['null_count'] == 10
@@ -122,15 +137,17 @@ class TestCheckPrimaryKeyNulls:
 
     def test_handle_composite_pk(self, mock_conn):
         # order_items has composite PK: [order_id, order_item_id]
-        conn, _ = mock_conn(fetchone=(50, 0))
+        conn, cursor = mock_conn(fetchall=[('order_items', 50, [0, 0])])
         result = check_primary_key_nulls(conn, 'order_items', 'snap1')
+        cursor.execute.assert_called_once()  # both columns come from one scan
         assert len(result) == 2
         assert all(r.passed for r in result)
         assert all(r.severity == 'error' for r in result)
 
     def test_returns_empty_for_unknown_table(self, mock_conn):
-        conn, _ = mock_conn()
+        conn, cursor = mock_conn()
         result = check_primary_key_nulls(conn, 'non_existent_table', 'snap1')
+        cursor.execute.assert_not_called()
         assert result == []
 
 
@@ -172,6 +189,128 @@ class TestCheckSchema:
         assert 'order_id' in result.details['missing_columns']
         assert result.severity == 'error'
 
+    def test_uses_schema_cache_without_query(self, mock_conn):
+        conn, cursor = mock_conn()
+        cache = {'orders': set(PRIMARY_KEYS['orders']) | {'_snapshot_id', '_run_id', '_inserted_at', '_source_file'}}
+        result = check_schema(conn, 'orders', cache)
+        assert result.passed is True
+        cursor.execute.assert_not_called()
+
+    def test_table_missing_from_cache_fails(self, mock_conn):
+        conn, _ = mock_conn()
+        result = check_schema(conn, 'orders', {})
+        assert result.passed is False
+        assert 'order_id' in result.details['missing_columns']
+
+    def test_fetch_bronze_schema_groups_by_table(self, mock_conn):
+        conn, cursor = mock_conn(fetchall=[('orders', 'order_id'), ('orders', '_run_id'), ('sellers', 'seller_id')])
+        assert fetch_bronze_schema(conn) == {'orders': {'order_id', '_run_id'}, 'sellers': {'seller_id'}}
+        cursor.execute.assert_called_once()
+
+
+### fused run checks
+
+class TestRunQualityChecks:
+    """
+    WHAT: Verify run_quality_checks / run_snapshot_quality_checks derive not_empty,
+          row_count and pk_nulls from one UNION ALL of per-table COUNT(*) / COUNT(*) FILTER scans.
+
+    WHY:  Each check used to rescan the snapshot per table; the checks now run once
+          after all loads with a single query for all tables.
+
+    TECHNIQUE: mock_conn(fetchall=[(table, total, [nulls per pk col])]) simulates the
+    fused query; the schema comes from a schema_cache dict (or a second fetchall).
+    """
+
+    METADATA = ['_snapshot_id', '_run_id', '_inserted_at', '_source_file']
+
+    def _cache(self, *tables):
+        return {t: set(PRIMARY_KEYS[t] + self.METADATA) for t in tables}
+
+    def test_single_query_for_all_tables(self, mock_conn):
+        conn, cursor = mock_conn(fetchall=[('order_items', 50, [0, 0]), ('orders', 10, [0])])
+        results = run_snapshot_quality_checks(
+            conn, {'order_items': 50, 'orders': 10}, 'snap1', self._cache('order_items', 'orders')
+        )
+        cursor.execute.assert_called_once()
+        query, params = cursor.execute.call_args.args
+        assert params == ('snap1', 'snap1')
+        assert {r.table for r in results} == {'order_items', 'orders'}
+        assert all(r.passed for r in results)
+
+    def test_fetches_schema_once_without_cache(self, mock_conn):
+        conn, cursor = mock_conn()
+        schema_rows = [('order_items', c) for c in PRIMARY_KEYS['order_items'] + self.METADATA]
+        cursor.fetchall.side_effect = [schema_rows, [('order_items', 50, [0, 0])]]
+        results = run_quality_checks(conn, 'order_items', 'snap1', expected_rows=50)
+        # one schema lookup + one fused scan
+        assert cursor.execute.call_count == 2
+        assert next(r for r in results if r.check_name == 'schema').passed is True
+
+    def test_no_tables_runs_nothing(self, mock_conn):
+        conn, cursor = mock_conn()
+        assert run_snapshot_quality_checks(conn, {}, 'snap1') == []
+        cursor.execute.assert_not_called()
+
+    def test_query_composed_once_per_table(self, mock_conn):
+        quality_bronze._snapshot_counts_query.cache_clear()
+        for _ in range(3):
+            conn, _ = mock_conn(fetchall=[('order_items', 50, [0, 0])])
+            run_quality_checks(conn, 'order_items', 'snap1', expected_rows=50, schema_cache=self._cache('order_items'))
+        info = quality_bronze._snapshot_counts_query.cache_info()
+        assert (info.misses, info.hits) == (1, 2)
+
+    def test_results_from_fused_counts(self, mock_conn):
+        conn, _ = mock_conn(fetchall=[('order_items', 200, [0, 10])])
+        results = {r.check_name: r for r in run_quality_checks(
+            conn, 'order_items', 'snap1', expected_rows=200, schema_cache=self._cache('order_items')
+        )}
+        assert results['not_empty'].passed is True
+        assert results['row_count'].details == {'expected': 200, 'actual': 200}
+        assert results['schema'].passed is True
+        assert results['pk_null_order_id'].passed is True
+        assert results['pk_null_order_item_id'].passed is False
+        assert results['pk_null_order_item_id'].details['null_rate'] == 0.05
+
+    def test_empty_snapshot(self, mock_conn):
+        conn, _ = mock_conn(fetchall=[('orders', 0, [0])])
+        results = {r.check_name: r for r in run_quality_checks(
+            conn, 'orders', 'snap1', expected_rows=None, schema_cache=self._cache('orders')
+        )}
+        assert results['not_empty'].passed is False
+        assert results['row_count'].details['skipped'] is True
+        assert results['pk_null_order_id'].details['null_rate'] == 0
+
+
+### persisting results
+
+class TestPersistQualityResults:
+    """
+    WHAT: Verify persist_quality_results writes every result in one batched insert.
+
+    WHY:  One INSERT per result meant a round-trip per check; execute_values sends them together.
+
+    TECHNIQUE: Patch execute_values in quality_bronze and inspect the rows it receives.
+    """
+
+    def test_single_batch_with_json_details(self, mock_conn):
+        conn, cursor = mock_conn()
+        results = [
+            QualityResult('orders', 'not_empty', True, 'error', {'row_count': 5}),
+            QualityResult('orders', 'row_count', False, 'error', {'expected': 6, 'actual': 5}),
+        ]
+        with patch.object(quality_bronze, 'execute_values') as ev:
+            persist_quality_results(conn, 'run1', results)
+
+        ev.assert_called_once()
+        rows = ev.call_args.args[2]
+        assert [r[:5] for r in rows] == [
+            ('run1', 'orders', 'not_empty', True, 'error'),
+            ('run1', 'orders', 'row_count', False, 'error'),
+        ]
+        assert all(isinstance(r[5], Json) for r in rows)
+        cursor.execute.assert_not_called()
+
 
 ### cross-table consistency checks
 
@@ -0,0 +1,115 @@
+"""
+Tests for run_bronze.py: extract_and_load, the pipelined full run where
+files are loaded while the rest of the snapshot is still being extracted.
+
+WHAT THESE TESTS COVER:
+  extract_and_load — Every file handed over by extract reaches load_files with its path and entry,
+                     a skipped extract falls back to load on the manifest, a failed extract reaches
+                     load_files so the run fails, and a failed load stops the extract.
+
+TECHNIQUE:
+  extract, load_files and load are monkeypatched in run_bronze; the fake extract
+  calls on_file like the real one, so the queue hand-off is exercised for real.
+"""
+import pytest
+from bronze import run_bronze
+from bronze.config import raw_dir
+
+
+def _entries(n):
+    return [{'filename': f"file{i}.csv", 'hash': f"h{i}", 'size': i} for i in range(n)]
+
+
+class TestExtractAndLoad:
+    """
+    WHAT: Verify the producer/consumer hand-off between extract and load_files.
+
+    WHY:  A lost file would never be loaded, a blocked producer would hang the pipeline.
+
+    TECHNIQUE: More entries than FILE_QUEUE_SIZE, so the bounded queue actually fills up.
+    """
+    def _fake_extract(self, entries, error=None):
+        def _extract(force=False, on_file=None):
+            for entry in entries:
+                on_file('snap1', entry)
+            if error:
+                raise error
+            return {'snapshot_id': 'snap1', 'files': entries}
+        return _extract
+
+    def test_streams_every_file_to_the_loader(self, monkeypatch):
+        entries = _entries(run_bronze.FILE_QUEUE_SIZE * 2)
+        seen = []
+
+        def _load_files(snapshot_id, files, run_id=None, extract_error=None):
+            seen.extend((snapshot_id, *f) for f in files)
+            assert extract_error() is None
+            return 'summary'
+
+        monkeypatch.setattr(run_bronze, 'extract', self._fake_extract(entries))
+        monkeypatch.setattr(run_bronze, 'load_files', _load_files)
+
+        manifest, summary = run_bronze.extract_and_load()
+        assert summary == 'summary'
+        assert manifest['snapshot_id'] == 'snap1'
+        assert seen == [('snap1', e['filename'], raw_dir('snap1') / e['filename'], e) for e in entries]
+
+    def test_skipped_extract_loads_the_manifest(self, monkeypatch):
+        monkeypatch.setattr(run_bronze, 'extract', lambda force=False, on_file=None: {'snapshot_id': 'snap0', 'files': []})
+        monkeypatch.setattr(run_bronze, 'load', lambda snapshot_id: f"loaded {snapshot_id}")
+
+        manifest, summary = run_bronze.extract_and_load()
+        assert summary == 'loaded snap0'
+
+    def test_extract_error_is_raised(self, monkeypatch):
+        reported = []
+
+        def _load_files(snapshot_id, files, run_id=None, extract_error=None):
+            list(files)
+            reported.append(extract_error())
+            return 'summary'
+
+        monkeypatch.setattr(run_bronze, 'extract', self._fake_extract(_entries(2), error=RuntimeError('download broke')))
+        monkeypatch.setattr(run_bronze, 'load_files', _load_files)
+
+        with pytest.raises(RuntimeError, match='download broke'):
+            run_bronze.extract_and_load()
+        # the files streamed before the failure were loaded, the run must still learn about the failure
+        assert reported == ['RuntimeError: download broke']
+
+    def test_extract_error_without_message_is_reported(self, monkeypatch):
+        reported = []
+
+        def _load_files(snapshot_id, files, run_id=None, extract_error=None):
+            list(files)
+            reported.append(extract_error())
+            return 'summary'
+
+        monkeypatch.setattr(run_bronze, 'extract', self._fake_extract(_entries(1), error=MemoryError()))
+        monkeypatch.setattr(run_bronze, 'load_files', _load_files)
+
+        with pytest.raises(MemoryError):
+            run_bronze.extract_and_load()
+        assert reported == ['MemoryError']
+
+    def test_load_error_stops_the_extract(self, monkeypatch):
+        entries = _entries(run_bronze.FILE_QUEUE_SIZE * 3)
+        handed_over = []
+
+        def _load_files(snapshot_id, files, run_id=None, extract_error=None):
+            next(iter(files))
+            raise RuntimeError('database is unhealthy')
+
+        def _extract(force=False, on_file=None):
+            for entry in entries:
+                on_file('snap1', entry)
+                handed_over.append(entry)
+            return {'snapshot_id': 'snap1', 'files': entries}
+
+        monkeypatch.setattr(run_bronze, 'extract', _extract)
+        monkeypatch.setattr(run_bronze, 'load_files', _load_files)
+
+        with pytest.raises(RuntimeError, match='unhealthy'):
+            run_bronze.extract_and_load()
+        # the extract stopped at its next file instead of running to completion, and never hung on the full queue
+        assert len(handed_over) < len(entries)